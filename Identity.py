@@ -1,137 +1,136 @@
-import pandas as pd
-import pymysql
-import pyodbc
-import sshtunnel
 import logging
-import urllib.parse
-from sqlalchemy import create_engine
 from mysql.connector import Error as MyError
 import time
 import warnings
-from dotenv import load_dotenv
-import os
+from etl_options import parse_table_args, extract_conditions
+from mysql_merge import upsert_data, merge_via_temp_table
+from delete_sync import propagate_deletes
+from extract_cache import get_watermark, make_cache_key, read_sql_cached, is_cached
+from checkpoint import save_checkpoint, get_resume_key, clear_checkpoint
+from load_throughput import record_load
+from batch_sizer import BatchSizer
+from memory_budget import MemoryBudget
+from run_metrics import start_run, for_table, finish_run
+from passthrough import load_passthrough
+from tunnel_supervisor import TunnelSupervisor
+from connections import (load_config, get_sql_server_connection, get_mysql_connection, get_mysql_engine,
+                         reopen_sql_server_connection)
+from etl_logging import setup_logging, batch_log
+from tracing import traced_sleep
 
 warnings.filterwarnings("ignore", category=UserWarning)
 
 # Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+setup_logging()
 logger = logging.getLogger(__name__)
 
-def create_ssh_tunnel(ssh_host, ssh_username, ssh_password, ssh_private_key_path, remote_host, remote_port):
-    """Create SSH tunnel to SQL Server"""
-    try:
-        tunnel = sshtunnel.SSHTunnelForwarder(
-            ssh_host,
-            ssh_username=ssh_username,
-            ssh_password=ssh_password,
-            ssh_private_key=ssh_private_key_path,
-            remote_bind_address=(remote_host, remote_port),
-            local_bind_address=('127.0.0.1', 0),
-        )
-        tunnel.start()
-        logger.info(f"SSH tunnel established on local port {tunnel.local_bind_port}")
-        return tunnel
-    except Exception as e:
-        logger.error(f"Failed to create SSH tunnel: {str(e)}")
-        raise
-
-def get_sql_server_connection(tunnel, sql_server_db, sql_server_user, sql_server_password):
-    """Create connection to SQL Server through SSH tunnel"""
-    try:
-        conn_str = (
-            f"DRIVER={{ODBC Driver 17 for SQL Server}};"
-            f"SERVER=127.0.0.1,{tunnel.local_bind_port};"
-            f"DATABASE={sql_server_db};"
-            f"UID={sql_server_user};"
-            f"PWD={sql_server_password}"
-        )
-        conn = pyodbc.connect(conn_str)
-        logger.info("Connected to SQL Server")
-        return conn
-    except Exception as e:
-        logger.error(f"Failed to connect to SQL Server: {str(e)}")
-        raise
-
-def get_mysql_connection(mysql_host, mysql_user, mysql_password, mysql_db):
-    """Create connection to MySQL"""
-    try:
-        conn = pymysql.connect(
-            host=mysql_host,
-            user=mysql_user,
-            password=mysql_password,
-            database=mysql_db
-        )
-        logger.info("Connected to MySQL")
-        return conn
-    except Exception as e:
-        logger.error(f"Failed to connect to MySQL: {str(e)}")
-        raise
-
-def fetch_data(sql_conn, schema, table_name, sql_columns):
+def fetch_data(sql_conn, schema, table_name, sql_columns, order_by=None, cache_key=None, resume_after=None,
+               where=()):
     """Fetch specified columns from SQL Server table"""
     try:
+        if resume_after is not None and not is_cached(cache_key):
+            # Push the resume key down to SQL Server instead of re-reading the whole table into a new entry
+            cache_key = None
         column_str = ', '.join([f'[{col}]' for col in sql_columns])
         query = f"SELECT {column_str} FROM {schema}.[{table_name}]"
-        df = pd.read_sql(query, sql_conn)
+        conditions = list(where)
+        if order_by and resume_after is not None and cache_key is None:
+            conditions.append(f"[{order_by}] > {int(resume_after)}")
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        if order_by:
+            # Request rows in PK order so inserts append to the InnoDB clustered index
+            query += f" ORDER BY [{order_by}]"
+        df = read_sql_cached(sql_conn, query, sql_columns, cache_key)
+        if resume_after is not None and cache_key is not None:
+            # The cache holds the full extract; keep only the unfinished tail
+            df = df[df[order_by] > resume_after].reset_index(drop=True)
         logger.info(f"Fetched {len(df)} rows from {schema}.{table_name}")
         return df
     except Exception as e:
         logger.error(f"Failed to fetch data from {schema}.{table_name}: {str(e)}")
         raise
 
-def insert_data(mysql_conn, mysql_engine, table_name, df, mysql_columns, batch_size=10000, truncate=False):
+def insert_data(mysql_conn, mysql_engine, table_name, df, mysql_columns, batch_size=10000, truncate=False, order_by=None, checkpoint=False, sizer=None):
     """Insert data into MySQL table in batches with retry logic"""
     try:
         cursor = mysql_conn.cursor()
+        metrics = for_table(table_name)
         
         # Disable foreign key checks
         cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
         mysql_conn.commit()
         
         # Get initial count
-        cursor.execute(f"SELECT COUNT(*) FROM `{table_name}`")
-        before_count = cursor.fetchone()[0]
+        with metrics.stage('verify'):
+            cursor.execute(f"SELECT COUNT(*) FROM `{table_name}`")
+            before_count = cursor.fetchone()[0]
         logger.info(f"Records in target table '{table_name}' before operation: {before_count}")
         
         # Truncate table if requested
         if truncate:
-            try:
-                cursor.execute(f"TRUNCATE TABLE `{table_name}`")
-                mysql_conn.commit()
-                logger.info(f"Successfully truncated table '{table_name}'")
-            except MyError as e:
-                logger.error(f"Error truncating table '{table_name}': {str(e)}")
-                mysql_conn.rollback()
-                raise
+            with metrics.stage('truncate'):
+                try:
+                    cursor.execute(f"TRUNCATE TABLE `{table_name}`")
+                    mysql_conn.commit()
+                    logger.info(f"Successfully truncated table '{table_name}'")
+                except MyError as e:
+                    logger.error(f"Error truncating table '{table_name}': {str(e)}")
+                    mysql_conn.rollback()
+                    raise
         
         # Rename DataFrame columns to match MySQL target columns
         df.columns = mysql_columns
+
+        # Load in ascending key order to avoid page splits on the clustered index
+        if order_by and not df[order_by].is_monotonic_increasing:
+            df = df.sort_values(order_by, kind='mergesort').reset_index(drop=True)
+            logger.info(f"Sorted {len(df)} rows by '{order_by}' before loading into '{table_name}'")
         
         # Insert data in batches
+        if sizer is None:
+            sizer = BatchSizer(table_name, batch_size, adaptive=False)
         total_rows = len(df)
         total_inserted = 0
-        for start in range(0, total_rows, batch_size):
-            batch_df = df.iloc[start:start + batch_size]
+        start = 0
+        batch_num = 0
+        while start < total_rows:
+            batch_num += 1
+            batch_df = df.iloc[start:start + sizer.size]
+            start += len(batch_df)
             try:
+                started = time.perf_counter()
                 batch_df.to_sql(table_name, mysql_engine, if_exists='append', index=False)
+                sizer.record(len(batch_df), time.perf_counter() - started)
                 total_inserted += len(batch_df)
-                logger.info(f"Inserted batch {start//batch_size + 1}: {len(batch_df)} rows into '{table_name}'")
+                logger.info("Inserted batch %d: %d rows into '%s'", batch_num, len(batch_df), table_name, extra=batch_log(table_name))
             except Exception as e:
-                logger.error(f"Error in batch {start//batch_size + 1} for '{table_name}': {str(e)}")
+                logger.error(f"Error in batch {batch_num} for '{table_name}': {str(e)}")
                 mysql_conn.rollback()
-                time.sleep(5)
+                sizer.record_error()
+                traced_sleep(5, table=table_name, batch=batch_num)
+                # Retry with the reduced size; rows past it are picked up by the next batch
+                start -= len(batch_df) - min(len(batch_df), sizer.size)
+                batch_df = batch_df.iloc[:sizer.size]
                 try:
                     batch_df.to_sql(table_name, mysql_engine, if_exists='append', index=False)
                     total_inserted += len(batch_df)
-                    logger.info(f"Successfully retried batch {start//batch_size + 1}: {len(batch_df)} rows into '{table_name}'")
+                    logger.info("Successfully retried batch %d: %d rows into '%s'", batch_num, len(batch_df), table_name,
+                                extra=batch_log(table_name))
                 except Exception as retry_e:
-                    logger.error(f"Retry failed for batch {start//batch_size + 1} in '{table_name}': {str(retry_e)}")
+                    logger.error(f"Retry failed for batch {batch_num} in '{table_name}': {str(retry_e)}")
                     mysql_conn.rollback()
+                    if checkpoint:
+                        # Stop at the first lost batch so --resume restarts from it
+                        raise
                     continue
+            if checkpoint and order_by:
+                save_checkpoint(table_name, batch_df[order_by].iloc[-1], total_inserted)
         
         # Verify final count
-        cursor.execute(f"SELECT COUNT(*) FROM `{table_name}`")
-        after_count = cursor.fetchone()[0]
+        with metrics.stage('verify'):
+            cursor.execute(f"SELECT COUNT(*) FROM `{table_name}`")
+            after_count = cursor.fetchone()[0]
         logger.info(f"Attempted to insert {total_rows} rows into '{table_name}'")
         logger.info(f"Successfully inserted {total_inserted} rows into '{table_name}'")
         logger.info(f"Total records in target table '{table_name}' after insertion: {after_count}")
@@ -147,33 +146,15 @@ def insert_data(mysql_conn, mysql_engine, table_name, df, mysql_columns, batch_s
     finally:
         cursor.close()
 
-def main():
-    # Load environment variables from .env file
-    load_dotenv()
+def main(argv=None):
+    args = parse_table_args('Identity', argv, passthrough=True, watermark=True)
 
-    # Configuration from environment variables
-    ssh_config = {
-        'host': os.getenv('SSH_HOST'),
-        'username': os.getenv('SSH_USERNAME'),
-        'password': os.getenv('SSH_PASSWORD') or None,  # Handle empty password
-        'private_key_path': os.getenv('SSH_PRIVATE_KEY_PATH'),
-        'remote_host': os.getenv('SSH_REMOTE_HOST'),
-        'remote_port': int(os.getenv('SSH_REMOTE_PORT'))
-    }
-    sql_server_config = {
-        'database': os.getenv('SQL_SERVER_DATABASE'),
-        'user': os.getenv('SQL_SERVER_USER'),
-        'password': os.getenv('SQL_SERVER_PASSWORD')
-    }
-    mysql_config = {
-        'host': os.getenv('MYSQL_HOST'),
-        'user': os.getenv('MYSQL_USER'),
-        'password': os.getenv('MYSQL_PASSWORD'),
-        'database': os.getenv('MYSQL_DATABASE')
-    }
+    # Configuration from .env
+    ssh_config, sql_server_config, mysql_config = load_config()
     
     # Table and column mappings
     table_name = 'Identity' 
+    key_column = 'identityID'
     sql_columns = [
         'identityID','personID','effectiveDate','lastName','firstName',
         'middleName','suffix','alias','gender','birthdate','ssn','raceEthnicity','birthCountry','dateEnteredUS','birthVerification','comments','districtID',
@@ -197,51 +178,113 @@ def main():
         'birthGender','languageInterpreter','languageAltInterpreter','languageAlt2Interpreter','educationLevel','pronounID','tribalEnrollment','languageAlt3','languageAlt4'
     ]
     
+    metrics = start_run(table_name, mode=f"{args.mode}-passthrough" if args.passthrough else args.mode,
+                        profile=args.profile, trace=args.trace)
     try:
-        # Create SSH tunnel
-        tunnel = create_ssh_tunnel(
-            ssh_config['host'],
-            ssh_config['username'],
-            ssh_config['password'],
-            ssh_config['private_key_path'],
-            ssh_config['remote_host'],
-            ssh_config['remote_port']
-        )
+        # Create SSH tunnel with keepalives and automatic re-establishment
+        with metrics.stage('tunnel'):
+            tunnel = TunnelSupervisor(ssh_config).start()
         
         # Connect to databases
-        sql_conn = get_sql_server_connection(
-            tunnel,
-            sql_server_config['database'],
-            sql_server_config['user'],
-            sql_server_config['password']
-        )
-        mysql_conn = get_mysql_connection(
-            mysql_config['host'],
-            mysql_config['user'],
-            mysql_config['password'],
-            mysql_config['database']
-        )
+        with metrics.stage('connect'):
+            sql_conn = get_sql_server_connection(
+                tunnel,
+                sql_server_config['database'],
+                sql_server_config['user'],
+                sql_server_config['password']
+            )
+            mysql_conn = get_mysql_connection(
+                mysql_config['host'],
+                mysql_config['user'],
+                mysql_config['password'],
+                mysql_config['database'],
+                compress=mysql_config['compress']
+            )
         
-        # Create SQLAlchemy engine
-        encoded_password = urllib.parse.quote(mysql_config['password'])
-        mysql_engine = create_engine(
-            f"mysql+pymysql://{mysql_config['user']}:{encoded_password}@{mysql_config['host']}/{mysql_config['database']}?charset=utf8mb4"
-        )
+            # Create SQLAlchemy engine
+            mysql_engine = get_mysql_engine(mysql_config)
         
-        # Fetch and load data
-        df = fetch_data(sql_conn, 'dbo', table_name, sql_columns)
-        if not df.empty:
-            insert_data(
-                mysql_conn,
-                mysql_engine,
-                table_name,
-                df,
-                mysql_columns,
-                batch_size=10000,
-                truncate=True
-            )
+        # Only the rows named by --since/--key-range, when given
+        where = extract_conditions(args, key_column)
+
+        # Reuse a cached extract of the same source state when --cache is set
+        cache_key = None
+        if args.cache:
+            watermark = get_watermark(sql_conn, 'dbo', table_name, sql_columns)
+            cache_key = make_cache_key(table_name, sql_columns, watermark,
+                                       layout='arrow' if args.passthrough else 'pandas', where=where)
+
+        # Continue an interrupted load after its last committed key
+        resume_after = None
+        if args.resume:
+            resume_after = get_resume_key(table_name)
         else:
-            logger.warning(f"No data retrieved from source table '{table_name}'")
+            clear_checkpoint(table_name)
+
+        # Fetch and load data; if the tunnel drops, reconnect and resume from the checkpoint
+        attempt = 1
+        sizer = BatchSizer.for_table(table_name)
+        # Size pass-through record batches to the memory budget when one is set
+        fetch_size = 50000
+        if args.passthrough and args.memory_budget:
+            fetch_size = MemoryBudget(table_name, args.memory_budget, passthrough=True).initial_chunk_rows()
+        load_started, cpu_started = time.perf_counter(), time.process_time()
+        while True:
+            try:
+                if args.passthrough:
+                    with metrics.stage('load') as stage:
+                        rows_loaded = load_passthrough(sql_conn, mysql_conn, 'dbo', table_name, sql_columns, mysql_columns,
+                                                       key_column, mode=args.mode, sizer=sizer, fetch_size=fetch_size,
+                                                       swap=args.swap, resume_after=resume_after, checkpoint=True, cache_key=cache_key,
+                                                       where=where)
+                        stage.rows += rows_loaded
+                else:
+                    with metrics.stage('extract') as stage:
+                        df = fetch_data(sql_conn, 'dbo', table_name, sql_columns, order_by=key_column, cache_key=cache_key,
+                                        resume_after=resume_after, where=where)
+                        stage.rows += len(df)
+                        stage.bytes += stage.track_frame(df)
+                    with metrics.stage('load') as stage:
+                        if not df.empty:
+                            if args.mode == 'upsert':
+                                upsert_data(mysql_conn, table_name, df, mysql_columns, key_column,
+                                            order_by=key_column, checkpoint=True, sizer=sizer)
+                            elif args.mode == 'merge':
+                                merge_via_temp_table(mysql_conn, table_name, df, mysql_columns, key_column, sizer=sizer)
+                            else:
+                                insert_data(
+                                    mysql_conn,
+                                    mysql_engine,
+                                    table_name,
+                                    df,
+                                    mysql_columns,
+                                    sizer=sizer,
+                                    truncate=resume_after is None,
+                                    order_by=key_column,
+                                    checkpoint=True
+                                )
+                        else:
+                            logger.warning(f"No data retrieved from source table '{table_name}'")
+                        stage.rows += len(df)
+                    rows_loaded = len(df)
+                break
+            except Exception as e:
+                if not tunnel.recover(e, attempt):
+                    raise
+                attempt += 1
+                sql_conn = reopen_sql_server_connection(tunnel, sql_conn, sql_server_config)
+                resume_after = get_resume_key(table_name)
+
+        record_load(table_name, rows_loaded, time.perf_counter() - load_started, time.process_time() - cpu_started,
+                    mysql_config['compress'], args.mode)
+        sizer.save()
+        clear_checkpoint(table_name)
+
+        # Remove rows that were hard-deleted in Infinite Campus since the last load
+        if args.propagate_deletes:
+            with metrics.stage('deletes'):
+                propagate_deletes(sql_conn, mysql_conn, 'dbo', table_name, key_column)
+        metrics.status = 'success'
             
     except Exception as e:
         logger.error(f"Script failed: {str(e)}")
@@ -257,6 +300,7 @@ def main():
         if 'tunnel' in locals():
             tunnel.stop()
             logger.info("SSH tunnel closed")
+        finish_run(table_name)
 
 if __name__ == "__main__":
     main()
@@ -8,11 +8,12 @@ from sqlalchemy import create_engine
 from mysql.connector import Error as MyError
 import time
 import warnings
+from etl_logging import setup_logging, batch_log
 
 warnings.filterwarnings("ignore", category=UserWarning)
 
 # Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+setup_logging()
 logger = logging.getLogger(__name__)
 
 def create_ssh_tunnel(ssh_host, ssh_username, ssh_password, ssh_private_key_path, remote_host, remote_port):
@@ -120,7 +121,8 @@ def insert_data(mysql_conn, mysql_engine, table_name, df, mysql_columns, batch_s
             try:
                 batch_df.to_sql(table_name, mysql_engine, if_exists='append', index=False)
                 total_inserted += len(batch_df)
-                logger.info(f"Inserted batch {start//batch_size + 1}: {len(batch_df)} rows into '{table_name}'")
+                logger.info("Inserted batch %d: %d rows into '%s'", start//batch_size + 1, len(batch_df), table_name,
+                            extra=batch_log(table_name))
             except Exception as e:
                 logger.error(f"Error in batch {start//batch_size + 1} for '{table_name}': {str(e)}")
                 mysql_conn.rollback()
@@ -128,7 +130,8 @@ def insert_data(mysql_conn, mysql_engine, table_name, df, mysql_columns, batch_s
                 try:
                     batch_df.to_sql(table_name, mysql_engine, if_exists='append', index=False)
                     total_inserted += len(batch_df)
-                    logger.info(f"Successfully retried batch {start//batch_size + 1}: {len(batch_df)} rows into '{table_name}'")
+                    logger.info("Successfully retried batch %d: %d rows into '%s'", start//batch_size + 1, len(batch_df), table_name,
+                                extra=batch_log(table_name))
                 except Exception as retry_e:
                     logger.error(f"Retry failed for batch {start//batch_size + 1} in '{table_name}': {str(retry_e)}")
                     mysql_conn.rollback()
@@ -0,0 +1,520 @@
+import logging
+import os
+import shutil
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+import pyarrow as pa
+import pyarrow.parquet as pq
+from arrow_batches import read_record_batches, read_row_batches, filter_after, batch_to_rows, key_values, last_key
+from batch_sizer import BatchSizer
+from checkpoint import save_checkpoint
+from extract_cache import read_batches_cached, is_cached
+from mysql_merge import count_existing_keys
+from run_metrics import for_table
+from etl_logging import batch_log
+from tracing import traced_sleep
+
+logger = logging.getLogger(__name__)
+
+# Sources yield Arrow record batches in key order; sinks write them in sizer-sized slices.
+# Sinks that bind tuples take plain fetchmany rows (RowBatch) instead when nothing needs
+# columns. The same copy_table loop runs against SQL Server -> MySQL in production and
+# against SQLite files or Parquet directories on a laptop.
+SHADOW_SUFFIX = '__shadow'
+RETIRED_SUFFIX = '__retired'
+
+def build_write_query(table_name, mysql_columns, key_column, mode):
+    """INSERT (or INSERT ... ON DUPLICATE KEY UPDATE for upserts) that executemany batches into multi-row VALUES"""
+    column_str = ', '.join([f'`{col}`' for col in mysql_columns])
+    placeholders = ', '.join(['%s'] * len(mysql_columns))
+    query = f"INSERT INTO `{table_name}` ({column_str}) VALUES ({placeholders})"
+    if mode == 'upsert':
+        update_str = ', '.join([f'`{col}` = VALUES(`{col}`)' for col in mysql_columns if col != key_column])
+        query += f" ON DUPLICATE KEY UPDATE {update_str}"
+    return query
+
+def select_query(table_name, columns, key_column, after=None, schema=None, quote=('[', ']'), where=()):
+    """SELECT columns in key order, optionally only the rows after a key and matching the where conditions"""
+    left, right = quote
+    column_str = ', '.join([f'{left}{col}{right}' for col in columns])
+    table = f"{schema}.{left}{table_name}{right}" if schema else f"{left}{table_name}{right}"
+    query = f"SELECT {column_str} FROM {table}"
+    conditions = list(where)
+    if after is not None:
+        conditions.append(f"{left}{key_column}{right} > {int(after)}")
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    return query + f" ORDER BY {left}{key_column}{right}"
+
+def sqlite_type(column):
+    """SQLite declared type for a ddl_schema column; TIMESTAMP/DATE make sqlite3 return datetime objects"""
+    if column['type'] in ('tinyint', 'smallint', 'mediumint', 'int', 'integer', 'bigint', 'bit'):
+        return 'INTEGER'
+    if column['type'] in ('decimal', 'numeric', 'float', 'double'):
+        return 'REAL'
+    if column['type'] in ('datetime', 'timestamp'):
+        return 'TIMESTAMP'
+    if column['type'] == 'date':
+        return 'DATE'
+    return 'TEXT'
+
+class Source(ABC):
+    """Where rows come from: read_batches yields Arrow record batches in key order"""
+
+    @abstractmethod
+    def read_batches(self, table_name, columns, key_column, after=None, batch_size=50000):
+        pass
+
+    def read_rows(self, table_name, columns, key_column, after=None, batch_size=50000):
+        """Like read_batches, but may yield RowBatches of plain tuples where that skips a conversion"""
+        return self.read_batches(table_name, columns, key_column, after, batch_size=batch_size)
+
+    def close(self):
+        pass
+
+class SqlServerSource(Source):
+    """SQL Server over an open pyodbc connection, optionally through the extract cache.
+
+    where restricts every read to the rows matching those conditions (see
+    etl_options.extract_conditions). open() also starts the SSH tunnel and owns it; a
+    source built around an existing connection leaves closing it to the caller.
+    """
+
+    def __init__(self, sql_conn, schema='dbo', cache_key=None, tunnel=None, where=()):
+        self.sql_conn = sql_conn
+        self.schema = schema
+        self.cache_key = cache_key
+        self.tunnel = tunnel
+        self.where = list(where)
+
+    @classmethod
+    def open(cls, ssh_config, sql_server_config, schema='dbo'):
+        """Start a supervised tunnel and connect through it"""
+        from connections import get_sql_server_connection
+        from tunnel_supervisor import TunnelSupervisor
+        tunnel = TunnelSupervisor(ssh_config).start()
+        try:
+            sql_conn = get_sql_server_connection(
+                tunnel,
+                sql_server_config['database'],
+                sql_server_config['user'],
+                sql_server_config['password']
+            )
+        except Exception:
+            tunnel.stop()
+            raise
+        return cls(sql_conn, schema, tunnel=tunnel)
+
+    def _uncached(self, after):
+        # A resumed read only pulls the rows after the checkpoint over the tunnel; the cache
+        # serves it only when a complete extract is already on disk
+        return self.cache_key is None or (after is not None and not is_cached(self.cache_key))
+
+    def read_batches(self, table_name, columns, key_column, after=None, batch_size=50000):
+        if self._uncached(after):
+            query = select_query(table_name, columns, key_column, after, schema=self.schema, where=self.where)
+            yield from read_record_batches(self.sql_conn, query, batch_size=batch_size)
+            return
+        # The cache holds the full extract; keep only the unfinished tail
+        query = select_query(table_name, columns, key_column, schema=self.schema, where=self.where)
+        for batch in read_batches_cached(self.sql_conn, query, columns, self.cache_key, batch_size=batch_size):
+            yield batch if after is None else filter_after(batch, key_column, after)
+
+    def read_rows(self, table_name, columns, key_column, after=None, batch_size=50000):
+        # The extract cache reads and writes Parquet, so it stays on record batches
+        if not self._uncached(after):
+            return self.read_batches(table_name, columns, key_column, after, batch_size=batch_size)
+        query = select_query(table_name, columns, key_column, after, schema=self.schema, where=self.where)
+        return read_row_batches(self.sql_conn, query, batch_size=batch_size)
+
+    def close(self):
+        if self.tunnel is not None:
+            self.sql_conn.close()
+            self.tunnel.stop()
+            logger.info("SQL Server source closed")
+
+class SqliteSource(Source):
+    """A local SQLite file standing in for SQL Server"""
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES)
+
+    def read_batches(self, table_name, columns, key_column, after=None, batch_size=50000):
+        query = select_query(table_name, columns, key_column, after)
+        yield from read_record_batches(self.conn, query, batch_size=batch_size)
+
+    def read_rows(self, table_name, columns, key_column, after=None, batch_size=50000):
+        query = select_query(table_name, columns, key_column, after)
+        return read_row_batches(self.conn, query, batch_size=batch_size)
+
+    def close(self):
+        self.conn.close()
+
+class ParquetSource(Source):
+    """A directory with one sub-directory of key-ordered Parquet parts per table (as ParquetSink writes them)"""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def read_batches(self, table_name, columns, key_column, after=None, batch_size=50000):
+        path = os.path.join(self.directory, table_name)
+        if not os.path.isdir(path):
+            raise FileNotFoundError(f"No Parquet data for '{table_name}' in {self.directory}")
+        for name in sorted(name for name in os.listdir(path) if name.endswith('.parquet')):
+            for batch in pq.ParquetFile(os.path.join(path, name)).iter_batches(batch_size=batch_size, columns=columns):
+                yield batch if after is None else filter_after(batch, key_column, after)
+
+class Sink(ABC):
+    """Where rows go: truncate, write_batches and an optional shadow-table swap.
+
+    Subclasses implement _write (one slice, committed) and _rollback; write_batches
+    cuts record batches into sizer-sized slices, feeds latencies back to the sizer
+    and retries a failed slice once at a reduced size. Sinks with accepts_rows also
+    take RowBatches of plain tuples.
+    """
+    accepts_rows = False
+
+    @abstractmethod
+    def truncate(self, table_name):
+        pass
+
+    @abstractmethod
+    def create_shadow(self, table_name):
+        """Create an empty copy of table_name to load into; return its name"""
+
+    @abstractmethod
+    def swap(self, table_name, shadow_name):
+        """Replace table_name by the loaded shadow table"""
+
+    def close(self):
+        pass
+
+    def _begin(self, table_name):
+        pass
+
+    def _end(self, table_name):
+        pass
+
+    @abstractmethod
+    def _write(self, table_name, columns, batch, key_column, mode):
+        pass
+
+    def _rollback(self):
+        pass
+
+    def write_batches(self, table_name, columns, batches, key_column=None, mode='truncate', sizer=None,
+                      batch_size=10000, checkpoint=False):
+        """Write record batches into table_name's columns; return the number of rows written"""
+        if sizer is None:
+            sizer = BatchSizer(table_name, batch_size, adaptive=False)
+        total_written = 0
+        batch_num = 0
+        self._begin(table_name)
+        for record_batch in batches:
+            offset = 0
+            while offset < record_batch.num_rows:
+                batch_num += 1
+                # Zero-copy view of the next sizer.size rows
+                batch = record_batch.slice(offset, sizer.size)
+                for attempt in (1, 2):
+                    try:
+                        started = time.perf_counter()
+                        self._write(table_name, columns, batch, key_column, mode)
+                        sizer.record(batch.num_rows, time.perf_counter() - started)
+                        break
+                    except Exception as e:
+                        self._rollback()
+                        if attempt == 2:
+                            logger.error(f"Retry failed for batch {batch_num} in '{table_name}': {str(e)}")
+                            raise
+                        logger.error(f"Error in batch {batch_num} for '{table_name}': {str(e)}")
+                        sizer.record_error()
+                        traced_sleep(5, table=table_name, batch=batch_num)
+                        # Retry with the reduced size; rows past it are picked up by the next batch
+                        batch = batch.slice(0, sizer.size)
+                offset += batch.num_rows
+                total_written += batch.num_rows
+                if checkpoint:
+                    save_checkpoint(table_name, last_key(batch, key_column), total_written)
+                logger.info("Wrote batch %d: %d rows into '%s'", batch_num, batch.num_rows, table_name, extra=batch_log(table_name))
+        self._end(table_name)
+        return total_written
+
+class MySqlSink(Sink):
+    """MySQL (RDS in production) over a pymysql or mysql-connector connection"""
+    accepts_rows = True
+
+    def __init__(self, mysql_conn, owned=False):
+        self.mysql_conn = mysql_conn
+        self.owned = owned
+        self.write_queries = {}
+        self.upsert_counts = {}
+
+    @classmethod
+    def open(cls, mysql_config):
+        from connections import get_mysql_connection
+        mysql_conn = get_mysql_connection(
+            mysql_config['host'],
+            mysql_config['user'],
+            mysql_config['password'],
+            mysql_config['database'],
+            compress=mysql_config.get('compress', False)
+        )
+        return cls(mysql_conn, owned=True)
+
+    def _execute(self, *statements):
+        cursor = self.mysql_conn.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+            self.mysql_conn.commit()
+        finally:
+            cursor.close()
+
+    def truncate(self, table_name):
+        self._execute("SET FOREIGN_KEY_CHECKS = 0", f"TRUNCATE TABLE `{table_name}`", "SET FOREIGN_KEY_CHECKS = 1")
+        logger.info(f"Successfully truncated table '{table_name}'")
+
+    def foreign_keys(self, table_name, referencing=False):
+        """Foreign keys defined on table_name, or with referencing=True those of other tables pointing at it"""
+        if referencing:
+            match, params = "k.REFERENCED_TABLE_NAME = %s AND k.TABLE_NAME <> %s", (table_name, table_name)
+        else:
+            match, params = "k.TABLE_NAME = %s", (table_name,)
+        cursor = self.mysql_conn.cursor()
+        try:
+            cursor.execute(
+                "SELECT k.CONSTRAINT_NAME, k.TABLE_NAME, k.COLUMN_NAME, k.REFERENCED_TABLE_NAME, "
+                "k.REFERENCED_COLUMN_NAME, r.UPDATE_RULE, r.DELETE_RULE "
+                "FROM information_schema.KEY_COLUMN_USAGE k "
+                "JOIN information_schema.REFERENTIAL_CONSTRAINTS r "
+                "ON r.CONSTRAINT_SCHEMA = k.CONSTRAINT_SCHEMA AND r.CONSTRAINT_NAME = k.CONSTRAINT_NAME "
+                "AND r.TABLE_NAME = k.TABLE_NAME "
+                f"WHERE k.TABLE_SCHEMA = DATABASE() AND {match} "
+                "ORDER BY k.TABLE_NAME, k.CONSTRAINT_NAME, k.ORDINAL_POSITION",
+                params
+            )
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+        keys = {}
+        for name, table, column, referenced_table, referenced_column, update_rule, delete_rule in rows:
+            # mysql-connector may return information_schema text as bytearray
+            name, table, column, referenced_table, referenced_column, update_rule, delete_rule = (
+                v.decode() if isinstance(v, (bytes, bytearray)) else v
+                for v in (name, table, column, referenced_table, referenced_column, update_rule, delete_rule)
+            )
+            key = keys.setdefault((table, name), {
+                'name': name, 'table': table, 'columns': [], 'referenced_table': referenced_table,
+                'referenced_columns': [], 'update_rule': update_rule, 'delete_rule': delete_rule
+            })
+            key['columns'].append(column)
+            key['referenced_columns'].append(referenced_column)
+        return list(keys.values())
+
+    @staticmethod
+    def add_foreign_key(table_name, key, name, referenced_table):
+        """ALTER TABLE statement adding key to table_name as constraint name, pointing at referenced_table"""
+        columns = ', '.join(f'`{col}`' for col in key['columns'])
+        referenced_columns = ', '.join(f'`{col}`' for col in key['referenced_columns'])
+        return (
+            f"ALTER TABLE `{table_name}` ADD CONSTRAINT `{name}` FOREIGN KEY ({columns}) "
+            f"REFERENCES `{referenced_table}` ({referenced_columns}) "
+            f"ON UPDATE {key['update_rule']} ON DELETE {key['delete_rule']}"
+        )
+
+    def create_shadow(self, table_name):
+        shadow_name = f"{table_name}{SHADOW_SUFFIX}"
+        self._execute(f"DROP TABLE IF EXISTS `{shadow_name}`", f"CREATE TABLE `{shadow_name}` LIKE `{table_name}`")
+        # CREATE TABLE ... LIKE copies no foreign keys. Constraint names are unique per schema, so the
+        # copies take the other name of a pair (FK_x <-> FK_x__shadow), alternating from swap to swap.
+        statements = ["SET FOREIGN_KEY_CHECKS = 0"]
+        for key in self.foreign_keys(table_name):
+            name = key['name']
+            name = name[:-len(SHADOW_SUFFIX)] if name.endswith(SHADOW_SUFFIX) else f"{name}{SHADOW_SUFFIX}"
+            referenced_table = shadow_name if key['referenced_table'] == table_name else key['referenced_table']
+            statements.append(self.add_foreign_key(shadow_name, key, name, referenced_table))
+        self._execute(*statements, "SET FOREIGN_KEY_CHECKS = 1")
+        return shadow_name
+
+    def swap(self, table_name, shadow_name):
+        # RENAME moves the foreign keys of referencing tables along with the old table, so they are
+        # re-pointed at the new one before the old one is dropped
+        children = self.foreign_keys(table_name, referencing=True)
+        retired_name = f"{table_name}{RETIRED_SUFFIX}"
+        statements = [
+            "SET FOREIGN_KEY_CHECKS = 0",
+            f"RENAME TABLE `{table_name}` TO `{retired_name}`, `{shadow_name}` TO `{table_name}`",
+        ]
+        for key in children:
+            statements.append(f"ALTER TABLE `{key['table']}` DROP FOREIGN KEY `{key['name']}`")
+            statements.append(self.add_foreign_key(key['table'], key, key['name'], table_name))
+        statements += [f"DROP TABLE `{retired_name}`", "SET FOREIGN_KEY_CHECKS = 1"]
+        self._execute(*statements)
+        logger.info(f"Swapped '{shadow_name}' in as '{table_name}' ({len(children)} referencing foreign keys re-pointed)")
+
+    def _begin(self, table_name):
+        self._execute("SET FOREIGN_KEY_CHECKS = 0")
+        self.upsert_counts[table_name] = {'inserted': 0, 'updated': 0, 'unchanged': 0}
+
+    def _end(self, table_name):
+        self._execute("SET FOREIGN_KEY_CHECKS = 1")
+        counts = self.upsert_counts[table_name]
+        if any(counts.values()):
+            logger.info(
+                f"Upsert into '{table_name}' complete: {counts['inserted']} inserted, {counts['updated']} updated, "
+                f"{counts['unchanged']} unchanged"
+            )
+
+    def _write(self, table_name, columns, batch, key_column, mode):
+        query_key = (table_name, tuple(columns), mode)
+        if query_key not in self.write_queries:
+            self.write_queries[query_key] = build_write_query(table_name, columns, key_column, mode)
+        rows = batch_to_rows(batch)
+        cursor = self.mysql_conn.cursor()
+        try:
+            if mode == 'upsert':
+                existing = count_existing_keys(cursor, table_name, key_column, key_values(batch, key_column))
+            cursor.executemany(self.write_queries[query_key], rows)
+            affected = cursor.rowcount
+            self.mysql_conn.commit()
+        finally:
+            cursor.close()
+        if mode == 'upsert':
+            # MySQL reports 1 affected row per insert, 2 per changed row and 0 per unchanged row
+            inserted = len(rows) - existing
+            updated = max(affected - inserted, 0) // 2
+            counts = self.upsert_counts[table_name]
+            counts['inserted'] += inserted
+            counts['updated'] += updated
+            counts['unchanged'] += existing - updated
+
+    def _rollback(self):
+        self.mysql_conn.rollback()
+
+    def close(self):
+        if self.owned:
+            self.mysql_conn.close()
+
+class SqliteSink(Sink):
+    """A local SQLite file standing in for MySQL; tables are created from the MySQL DDL on first use"""
+    accepts_rows = True
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+
+    def ensure_table(self, table_name, ddl_table=None):
+        """Create table_name with the columns of ddl_table (default: itself) unless it exists"""
+        from ddl_schema import parse_columns, primary_key
+        ddl_table = ddl_table or table_name
+        columns = parse_columns(ddl_table)
+        column_defs = ', '.join(f'[{c["name"]}] {sqlite_type(c)}' for c in columns)
+        key_column = primary_key(ddl_table)
+        if key_column:
+            column_defs += f", PRIMARY KEY ([{key_column}])"
+        self.conn.execute(f"CREATE TABLE IF NOT EXISTS [{table_name}] ({column_defs})")
+        self.conn.commit()
+
+    def truncate(self, table_name):
+        self.ensure_table(table_name)
+        self.conn.execute(f"DELETE FROM [{table_name}]")
+        self.conn.commit()
+
+    def create_shadow(self, table_name):
+        shadow_name = f"{table_name}{SHADOW_SUFFIX}"
+        self.conn.execute(f"DROP TABLE IF EXISTS [{shadow_name}]")
+        self.ensure_table(shadow_name, ddl_table=table_name)
+        return shadow_name
+
+    def swap(self, table_name, shadow_name):
+        with self.conn:
+            self.conn.execute(f"DROP TABLE IF EXISTS [{table_name}]")
+            self.conn.execute(f"ALTER TABLE [{shadow_name}] RENAME TO [{table_name}]")
+
+    def _begin(self, table_name):
+        self.ensure_table(table_name)
+
+    def _write(self, table_name, columns, batch, key_column, mode):
+        column_str = ', '.join([f'[{col}]' for col in columns])
+        verb = 'INSERT OR REPLACE' if mode == 'upsert' else 'INSERT'
+        query = f"{verb} INTO [{table_name}] ({column_str}) VALUES ({', '.join(['?'] * len(columns))})"
+        self.conn.executemany(query, batch_to_rows(batch))
+        self.conn.commit()
+
+    def _rollback(self):
+        self.conn.rollback()
+
+    def close(self):
+        self.conn.close()
+
+class ParquetSink(Sink):
+    """A directory of Parquet parts per table, for inspecting or replaying a load"""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def truncate(self, table_name):
+        shutil.rmtree(os.path.join(self.directory, table_name), ignore_errors=True)
+
+    def create_shadow(self, table_name):
+        shadow_name = f"{table_name}{SHADOW_SUFFIX}"
+        self.truncate(shadow_name)
+        return shadow_name
+
+    def swap(self, table_name, shadow_name):
+        self.truncate(table_name)
+        os.replace(os.path.join(self.directory, shadow_name), os.path.join(self.directory, table_name))
+
+    def _write(self, table_name, columns, batch, key_column, mode):
+        if mode != 'truncate':
+            raise ValueError(f"Parquet sinks only append; '{mode}' is not supported")
+        path = os.path.join(self.directory, table_name)
+        os.makedirs(path, exist_ok=True)
+        part = len([name for name in os.listdir(path) if name.endswith('.parquet')])
+        batch = pa.RecordBatch.from_arrays(batch.columns, names=list(columns))
+        pq.write_table(pa.Table.from_batches([batch]), os.path.join(path, f"part_{part:05d}.parquet"), compression='zstd')
+
+def copy_table(source, sink, table_name, source_columns, key_column, target_columns=None, mode='truncate',
+               resume_after=None, clean_batch=None, sizer=None, batch_size=10000, fetch_size=50000,
+               checkpoint=False, swap=False):
+    """Stream a table from source to sink as Arrow record batches; return the number of rows written.
+
+    mode is 'truncate' (empty the target first) or 'upsert'. With swap=True a truncate
+    load goes into a shadow table that replaces the target only once it is complete.
+    clean_batch, when given, maps each record batch to its cleaned batch. Without one,
+    a sink that binds tuples gets the source's fetchmany rows with no Arrow round trip.
+    """
+    if mode not in ('truncate', 'upsert'):
+        raise ValueError(f"Streaming loads support truncate and upsert modes, not '{mode}'")
+    if swap and (mode != 'truncate' or resume_after is not None):
+        raise ValueError("Shadow-table swaps need a full truncate load")
+    metrics = for_table(table_name)
+    target_table = table_name
+    if swap:
+        target_table = sink.create_shadow(table_name)
+    elif mode == 'truncate' and resume_after is None:
+        sink.truncate(table_name)
+
+    def cleaned(batches):
+        for record_batch in batches:
+            with metrics.stage('transform') as stage:
+                record_batch = clean_batch(record_batch)
+                stage.rows += record_batch.num_rows
+            yield record_batch
+
+    read = source.read_rows if clean_batch is None and sink.accepts_rows else source.read_batches
+    batches = metrics.timed_batches(
+        'extract', read(table_name, source_columns, key_column, resume_after, batch_size=fetch_size)
+    )
+    if clean_batch is not None:
+        batches = cleaned(batches)
+    total_written = sink.write_batches(target_table, target_columns or source_columns, batches, key_column, mode,
+                                       sizer=sizer, batch_size=batch_size, checkpoint=checkpoint)
+    if swap:
+        sink.swap(table_name, target_table)
+    logger.info(f"Streamed {total_written} rows into '{table_name}'")
+    return total_written
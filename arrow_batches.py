@@ -0,0 +1,151 @@
+import pyarrow as pa
+import pyarrow.compute as pc
+import datetime
+import decimal
+import logging
+import sys
+
+logger = logging.getLogger(__name__)
+
+# pyodbc reports each result column's Python type in cursor.description; map it to an
+# Arrow type so every record batch of a result set shares one schema. Anything not
+# listed (uuid.UUID, sql_variant, ...) is carried as its string form.
+ODBC_ARROW_TYPES = {
+    bool: pa.bool_(),
+    int: pa.int64(),
+    float: pa.float64(),
+    str: pa.string(),
+    datetime.datetime: pa.timestamp('us'),
+    datetime.date: pa.date32(),
+    datetime.time: pa.time64('us'),
+    bytes: pa.binary(),
+    bytearray: pa.binary(),
+}
+
+def schema_from_description(description, sample_rows=()):
+    """Return (Arrow schema, per-column value converter or None) for a pyodbc cursor description.
+
+    Drivers that report no column types (sqlite3) get them from the first non-null
+    value of each column in sample_rows.
+    """
+    fields = []
+    converters = []
+    for index, (name, type_code, _, _, precision, scale, _) in enumerate(description):
+        if type_code is None:
+            type_code = next((type(row[index]) for row in sample_rows if row[index] is not None), str)
+        if type_code is decimal.Decimal:
+            fields.append(pa.field(name, pa.decimal128(min(precision or 38, 38), scale or 0)))
+            converters.append(None)
+        elif type_code is bytearray:
+            fields.append(pa.field(name, pa.binary()))
+            converters.append(bytes)
+        elif type_code in ODBC_ARROW_TYPES:
+            fields.append(pa.field(name, ODBC_ARROW_TYPES[type_code]))
+            converters.append(None)
+        else:
+            fields.append(pa.field(name, pa.string()))
+            converters.append(str)
+    return pa.schema(fields), converters
+
+def rows_to_record_batch(rows, schema, converters):
+    """Transpose fetchmany rows into one Arrow record batch"""
+    columns = zip(*rows)
+    arrays = []
+    for values, field, convert in zip(columns, schema, converters):
+        if convert is not None:
+            values = [None if v is None else convert(v) for v in values]
+        arrays.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+def read_record_batches(sql_conn, query, batch_size=50000):
+    """Yield Arrow record batches of up to batch_size rows straight from a SQL Server result set"""
+    cursor = sql_conn.cursor()
+    cursor.arraysize = batch_size
+    try:
+        cursor.execute(query)
+        schema = converters = None
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            if schema is None:
+                schema, converters = schema_from_description(cursor.description, rows)
+            yield rows_to_record_batch(rows, schema, converters)
+    finally:
+        cursor.close()
+
+class RowBatch:
+    """fetchmany rows kept as plain tuples, sliceable like a record batch.
+
+    Sinks that bind tuples for executemany take these as they are, so a load with no
+    cleaning step and no extract cache never builds Arrow columns.
+    """
+
+    def __init__(self, rows, names):
+        self.rows = rows
+        self.names = names
+        self.num_rows = len(rows)
+
+    @property
+    def nbytes(self):
+        """In-memory size estimated from the first row (the tuple and its boxed values)"""
+        if not self.rows:
+            return 0
+        row = self.rows[0]
+        return self.num_rows * (sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row))
+
+    def slice(self, offset=0, length=None):
+        return RowBatch(self.rows[offset:None if length is None else offset + length], self.names)
+
+    def key_values(self, key_column):
+        index = self.names.index(key_column)
+        return [row[index] for row in self.rows]
+
+def read_row_batches(sql_conn, query, batch_size=50000):
+    """Yield RowBatches of up to batch_size plain tuples straight from a result set"""
+    cursor = sql_conn.cursor()
+    cursor.arraysize = batch_size
+    try:
+        cursor.execute(query)
+        names = None
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            if names is None:
+                names = [column[0] for column in cursor.description]
+            # pyodbc.Row is not a tuple, and the MySQL drivers only bind tuples/lists
+            yield RowBatch([tuple(row) for row in rows], names)
+    finally:
+        cursor.close()
+
+def filter_after(batch, key_column, last_key):
+    """Keep the rows whose key is greater than last_key"""
+    return batch.filter(pc.greater(batch.column(key_column), last_key))
+
+def batch_to_rows(batch):
+    """Return the rows of a record batch (or RowBatch) as tuples for executemany (nulls become None)"""
+    if isinstance(batch, RowBatch):
+        return batch.rows
+    return list(zip(*(column.to_pylist() for column in batch.columns)))
+
+def key_values(batch, key_column):
+    """Return the key column of a record batch (or RowBatch) as a list"""
+    if isinstance(batch, RowBatch):
+        return batch.key_values(key_column)
+    return batch.column(key_column).to_pylist()
+
+def last_key(batch, key_column):
+    """Return the key of the last row of a non-empty record batch (or RowBatch)"""
+    if isinstance(batch, RowBatch):
+        return batch.rows[-1][batch.names.index(key_column)]
+    return batch.column(key_column)[-1].as_py()
+
+def null_unless(batch, column_name, keep):
+    """Return batch with column_name set to NULL wherever keep is not true"""
+    index = batch.schema.get_field_index(column_name)
+    column = batch.column(index)
+    cleaned = pc.if_else(pc.fill_null(keep, False), column, pa.scalar(None, type=column.type))
+    columns = list(batch.columns)
+    columns[index] = cleaned
+    return pa.RecordBatch.from_arrays(columns, schema=batch.schema)
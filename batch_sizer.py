@@ -0,0 +1,121 @@
+import logging
+import os
+import time
+from etl_state import load_state, locked_state
+from ddl_schema import parse_columns
+from run_metrics import for_table
+
+logger = logging.getLogger(__name__)
+
+STATE_NAME = 'batch_sizes'
+
+# Starting point and ceiling: keep one multi-row INSERT well under max_allowed_packet
+BATCH_BYTE_BUDGET = int(os.getenv('ETL_BATCH_BYTE_BUDGET') or 4 * 1024 ** 2)
+TARGET_BATCH_SECONDS = float(os.getenv('ETL_TARGET_BATCH_SECONDS') or 2.0)
+MIN_BATCH_ROWS = 200
+MAX_BATCH_ROWS = 100000
+
+# Approximate bytes of a value in the INSERT statement for fixed-width MySQL types
+FIXED_TYPE_BYTES = {
+    'tinyint': 2, 'bit': 2, 'smallint': 6, 'mediumint': 8, 'int': 11, 'integer': 11, 'bigint': 20,
+    'float': 16, 'double': 24, 'date': 12, 'datetime': 21, 'timestamp': 21, 'time': 10, 'year': 4,
+}
+# Text/blob columns have no declared length; assume a modest fill
+UNBOUNDED_TYPE_BYTES = 512
+
+def estimate_row_bytes(table_name):
+    """Estimate the INSERT payload of one row from the table's column types in the MySQL DDL"""
+    row_bytes = 0
+    for column in parse_columns(table_name):
+        data_type, length = column['type'], column['length']
+        if data_type in FIXED_TYPE_BYTES:
+            size = FIXED_TYPE_BYTES[data_type]
+        elif data_type in ('decimal', 'numeric'):
+            size = (length or 10) + 2
+        elif length is not None:
+            size = length + 3
+        else:
+            size = UNBOUNDED_TYPE_BYTES
+        # ', ' separator between values
+        row_bytes += size + 2
+    return row_bytes
+
+class BatchSizer:
+    """Chooses write batch sizes for one table and adapts them to hold a target batch latency.
+
+    The first run starts from the DDL byte estimate; later runs start from the size the
+    previous run settled on. Adaptive sizes never exceed BATCH_BYTE_BUDGET of estimated
+    INSERT payload, however fast the writes are, so one multi-row statement stays under
+    max_allowed_packet. With adaptive=False it simply hands out a fixed size.
+    """
+
+    def __init__(self, table_name, initial_size=None, adaptive=True, target_seconds=TARGET_BATCH_SECONDS,
+                 min_size=MIN_BATCH_ROWS, max_size=MAX_BATCH_ROWS):
+        self.table_name = table_name
+        self.adaptive = adaptive
+        self.target_seconds = target_seconds
+        self.min_size = min_size
+        self.rows_per_second = None
+        self.row_bytes = self._row_bytes() if adaptive or initial_size is None else None
+        if adaptive and self.row_bytes:
+            max_size = max(min(max_size, BATCH_BYTE_BUDGET // self.row_bytes), min_size)
+        self.max_size = max_size
+        if initial_size is None:
+            initial_size = self._initial_size()
+        self.size = max(min(int(initial_size), self.max_size), self.min_size)
+
+    @classmethod
+    def for_table(cls, table_name):
+        """Adaptive sizer seeded from the last run, or from the DDL estimate on a first run"""
+        return cls(table_name)
+
+    def _row_bytes(self):
+        try:
+            return estimate_row_bytes(self.table_name)
+        except Exception as e:
+            logger.warning(f"No DDL byte estimate for '{self.table_name}' ({str(e)})")
+            return None
+
+    def _initial_size(self):
+        saved = load_state(STATE_NAME).get(self.table_name)
+        if saved:
+            logger.info(f"Starting '{self.table_name}' with saved batch size {saved['batch_size']}")
+            return saved['batch_size']
+        if not self.row_bytes:
+            logger.warning(f"Starting '{self.table_name}' at 10000 rows per batch")
+            return 10000
+        size = BATCH_BYTE_BUDGET // self.row_bytes
+        logger.info(f"Starting '{self.table_name}' at {size} rows per batch (~{self.row_bytes} bytes per row from DDL)")
+        return size
+
+    def record(self, rows, seconds):
+        """Feed back a successful write and resize toward the target latency"""
+        for_table(self.table_name).record_batch(rows, seconds)
+        if not self.adaptive or rows <= 0 or seconds <= 0:
+            return
+        rate = rows / seconds
+        # Smooth the observed rate so one slow batch does not swing the size
+        self.rows_per_second = rate if self.rows_per_second is None else 0.7 * self.rows_per_second + 0.3 * rate
+        wanted = self.rows_per_second * self.target_seconds
+        # Grow at most 2x and shrink at most 2x per batch
+        new_size = int(max(min(wanted, self.size * 2), self.size / 2))
+        new_size = max(min(new_size, self.max_size), self.min_size)
+        if new_size != self.size:
+            logger.debug(f"Batch size for '{self.table_name}': {self.size} -> {new_size} ({seconds:.2f}s for {rows} rows)")
+            self.size = new_size
+
+    def record_error(self):
+        """Halve the batch size after a failed write (packet too large, lock wait timeout, ...)"""
+        if not self.adaptive:
+            return
+        self.size = max(self.size // 2, self.min_size)
+        self.rows_per_second = None
+        logger.info(f"Batch size for '{self.table_name}' cut to {self.size} after a failed write")
+
+    def save(self):
+        """Persist the settled batch size as the starting point for the next run"""
+        if not self.adaptive:
+            return
+        with locked_state(STATE_NAME) as state:
+            state[self.table_name] = {'batch_size': self.size, 'updated': time.time()}
+        logger.info(f"Saved batch size {self.size} for '{self.table_name}'")
@@ -0,0 +1,165 @@
+import pandas as pd
+import pymysql
+import logging
+import urllib.parse
+import argparse
+import random
+import time
+import uuid
+from sqlalchemy import create_engine
+import warnings
+from dotenv import load_dotenv
+import os
+
+warnings.filterwarnings("ignore", category=UserWarning)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Enrollment-shaped scratch table: INT clustered key plus a GUID and some wide text
+BENCH_DDL = """
+CREATE TABLE `{table_name}` (
+    enrollmentID INT NOT NULL,
+    personID INT NOT NULL,
+    calendarID INT NOT NULL,
+    grade VARCHAR(4) NULL,
+    startDate DATETIME NULL,
+    startComments VARCHAR(255) NULL,
+    endComments VARCHAR(255) NULL,
+    enrollmentGUID CHAR(36) NOT NULL,
+    CONSTRAINT PK_{table_name} PRIMARY KEY (enrollmentID)
+) ENGINE=InnoDB
+"""
+
+def get_mysql_connection(mysql_host, mysql_user, mysql_password, mysql_db):
+    """Create connection to MySQL"""
+    try:
+        conn = pymysql.connect(
+            host=mysql_host,
+            user=mysql_user,
+            password=mysql_password,
+            database=mysql_db
+        )
+        logger.info("Connected to MySQL")
+        return conn
+    except Exception as e:
+        logger.error(f"Failed to connect to MySQL: {str(e)}")
+        raise
+
+def build_rows(row_count):
+    """Build a synthetic Enrollment-like DataFrame in ascending enrollmentID order"""
+    base = pd.Timestamp('2020-08-15')
+    return pd.DataFrame({
+        'enrollmentID': range(1, row_count + 1),
+        'personID': [random.randint(1, row_count // 3 + 1) for _ in range(row_count)],
+        'calendarID': [random.randint(1, 400) for _ in range(row_count)],
+        'grade': [random.choice(['KG', '01', '05', '09', '12']) for _ in range(row_count)],
+        'startDate': [base + pd.Timedelta(days=random.randint(0, 1500)) for _ in range(row_count)],
+        'startComments': ['x' * random.randint(0, 200) for _ in range(row_count)],
+        'endComments': ['y' * random.randint(0, 200) for _ in range(row_count)],
+        'enrollmentGUID': [str(uuid.uuid4()).upper() for _ in range(row_count)],
+    })
+
+def recreate_table(mysql_conn, table_name):
+    """Drop and recreate a benchmark scratch table"""
+    cursor = mysql_conn.cursor()
+    cursor.execute(f"DROP TABLE IF EXISTS `{table_name}`")
+    cursor.execute(BENCH_DDL.format(table_name=table_name))
+    mysql_conn.commit()
+    cursor.close()
+
+def table_size(mysql_conn, table_name):
+    """Return (data_length, index_length, data_free) for a table after ANALYZE"""
+    cursor = mysql_conn.cursor()
+    cursor.execute(f"ANALYZE TABLE `{table_name}`")
+    cursor.fetchall()
+    cursor.execute(
+        "SELECT DATA_LENGTH, INDEX_LENGTH, DATA_FREE FROM information_schema.TABLES "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+        (table_name,)
+    )
+    sizes = cursor.fetchone()
+    cursor.close()
+    return sizes
+
+def run_load(mysql_conn, mysql_engine, table_name, df, batch_size):
+    """Append df to a fresh scratch table in batches and return rows/second"""
+    recreate_table(mysql_conn, table_name)
+    start_time = time.perf_counter()
+    for start in range(0, len(df), batch_size):
+        df.iloc[start:start + batch_size].to_sql(table_name, mysql_engine, if_exists='append', index=False)
+    elapsed = time.perf_counter() - start_time
+    return len(df) / elapsed if elapsed else 0.0, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare PK-ordered vs unordered loads into an InnoDB table")
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--batch-size', type=int, default=10000)
+    parser.add_argument('--keep-tables', action='store_true', help="Leave the scratch tables in place")
+    parser.add_argument('--database', help="Scratch database to create the bench_pk_* tables in "
+                                           "(default BENCH_MYSQL_DATABASE)")
+    args = parser.parse_args()
+
+    load_dotenv()
+    # Scratch tables are created and dropped, so this never runs against the production target in MYSQL_*
+    mysql_config = {
+        'host': os.getenv('BENCH_MYSQL_HOST'),
+        'user': os.getenv('BENCH_MYSQL_USER'),
+        'password': os.getenv('BENCH_MYSQL_PASSWORD') or '',
+        'database': args.database or os.getenv('BENCH_MYSQL_DATABASE')
+    }
+    if not mysql_config['host'] or not mysql_config['database']:
+        raise SystemExit("Set BENCH_MYSQL_HOST/USER/PASSWORD/DATABASE (or pass --database) to a scratch MySQL database")
+    if (mysql_config['host'], mysql_config['database']) == (os.getenv('MYSQL_HOST'), os.getenv('MYSQL_DATABASE')):
+        raise SystemExit(f"Refusing to create benchmark tables in the production database "
+                         f"{mysql_config['database']} on {mysql_config['host']}")
+
+    try:
+        mysql_conn = get_mysql_connection(
+            mysql_config['host'],
+            mysql_config['user'],
+            mysql_config['password'],
+            mysql_config['database']
+        )
+        encoded_password = urllib.parse.quote(mysql_config['password'])
+        mysql_engine = create_engine(
+            f"mysql+pymysql://{mysql_config['user']}:{encoded_password}@{mysql_config['host']}/{mysql_config['database']}?charset=utf8mb4"
+        )
+
+        ordered_df = build_rows(args.rows)
+        shuffled_df = ordered_df.sample(frac=1, random_state=42).reset_index(drop=True)
+        logger.info(f"Generated {len(ordered_df)} synthetic rows")
+
+        results = {}
+        for label, df in (('ordered', ordered_df), ('unordered', shuffled_df)):
+            table_name = f"bench_pk_{label}"
+            rows_per_sec, elapsed = run_load(mysql_conn, mysql_engine, table_name, df, args.batch_size)
+            data_length, index_length, data_free = table_size(mysql_conn, table_name)
+            results[label] = (rows_per_sec, elapsed, data_length, index_length, data_free)
+            logger.info(
+                f"{label}: {rows_per_sec:.0f} rows/s ({elapsed:.1f}s), "
+                f"data={data_length / 1048576:.1f} MiB, index={index_length / 1048576:.1f} MiB, "
+                f"free={data_free / 1048576:.1f} MiB"
+            )
+
+        ordered, unordered = results['ordered'], results['unordered']
+        logger.info(f"Insert rate ordered/unordered: {ordered[0] / unordered[0]:.2f}x")
+        logger.info(f"Data size ordered/unordered: {ordered[2] / unordered[2]:.2f}x")
+
+        if not args.keep_tables:
+            cursor = mysql_conn.cursor()
+            for label in results:
+                cursor.execute(f"DROP TABLE IF EXISTS `bench_pk_{label}`")
+            mysql_conn.commit()
+            cursor.close()
+    except Exception as e:
+        logger.error(f"Benchmark failed: {str(e)}")
+        raise
+    finally:
+        if 'mysql_conn' in locals():
+            mysql_conn.close()
+            logger.info("MySQL connection closed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+import logging
+import argparse
+import importlib
+import sqlite3
+import time
+import uuid
+import sys
+import os
+import numpy as np
+import pyarrow as pa
+
+BENCH_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.data')
+SQLITE_SINK_PATH = os.path.join(BENCH_DIR, 'sink.sqlite')
+# Keep benchmark state, metrics, run history and cache apart from the production ones
+os.environ.setdefault('ETL_STATE_DIR', os.path.join(BENCH_DIR, 'state'))
+os.environ.setdefault('ETL_METRICS_DIR', os.path.join(BENCH_DIR, 'metrics'))
+os.environ.setdefault('ETL_CACHE_DIR', os.path.join(BENCH_DIR, 'cache'))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ddl_schema import parse_columns, primary_key, find_create_table
+from etl_tables import TABLES
+from batch_sizer import BatchSizer
+from run_metrics import start_run, finish_run
+from adapters import SqlServerSource, SqliteSink, MySqlSink, copy_table, sqlite_type
+from etl_logging import setup_logging
+
+# Configure logging
+setup_logging()
+logger = logging.getLogger(__name__)
+
+NULL_FRACTION = 0.1
+GENERATE_CHUNK = 100000
+STRING_POOL_SIZE = 500
+LAST_NAMES = ['Garcia', 'Smith', 'Nguyen', 'Johnson', 'Martinez', 'Brown', 'Lopez', 'Williams', 'Tso', 'Begay',
+              'Hernandez', 'Davis', 'Yazzie', 'Chavez', 'Miller', "O'Neil", 'Sánchez', 'Benally']
+FIRST_NAMES = ['Maria', 'James', 'Ava', 'Liam', 'Sofia', 'Noah', 'Isabella', 'Mateo', 'Mia', 'Elijah',
+               'Camila', 'Lucas', 'Aiyana', 'Kai', 'Zoë', 'Diego', 'Nizhoni', 'Ethan']
+INT_TYPES = ('tinyint', 'smallint', 'mediumint', 'int', 'integer', 'bigint')
+FLOAT_TYPES = ('decimal', 'numeric', 'float', 'double')
+DATETIME_TYPES = ('datetime', 'timestamp')
+EPOCH = np.datetime64('2000-01-01T00:00:00')
+# Cleaning looks these IDs up in the target: (column, referenced table, referenced column)
+REFERENCE_LOOKUPS = {
+    'Person': [('currentIdentityID', 'Identity', 'identityID'), ('modifiedByID', 'Users', 'userID')],
+}
+
+def string_pool(rng, length):
+    """Random printable strings of up to `length` characters"""
+    alphabet = np.array(list('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789 '))
+    max_len = max(min(length or 64, 40), 1)
+    lengths = rng.integers(1, max_len + 1, STRING_POOL_SIZE)
+    return [''.join(rng.choice(alphabet, n)) for n in lengths]
+
+def column_values(column, keys, rng, pools, is_key):
+    """Generate one column for a chunk of rows as a Python list"""
+    name, data_type, length, count = column['name'], column['type'], column['length'], len(keys)
+    if is_key:
+        return keys.tolist()
+    if 'guid' in name.lower():
+        # Unique and stable per key, like the IX_GUID unique constraints expect
+        values = [str(uuid.UUID(int=(int(k) * 0x9E3779B97F4A7C15F39CC0605CEDC835) % (1 << 128))).upper() for k in keys]
+    elif data_type == 'bit' or (data_type == 'tinyint' and length == 1):
+        values = rng.integers(0, 2, count).tolist()
+    elif data_type == 'smallint':
+        values = rng.integers(0, 3000, count).tolist()
+    elif data_type in INT_TYPES:
+        values = rng.integers(1, 1000000, count).tolist()
+    elif data_type in FLOAT_TYPES:
+        values = np.round(rng.random(count) * 1000, column['scale'] or 2).tolist()
+    elif data_type in DATETIME_TYPES:
+        values = (EPOCH + rng.integers(0, 26 * 365 * 86400, count).astype('timedelta64[s]')).tolist()
+    elif data_type == 'date':
+        values = (EPOCH.astype('datetime64[D]') + rng.integers(0, 26 * 365, count).astype('timedelta64[D]')).tolist()
+    else:
+        if name.lower().endswith('lastname'):
+            pool = LAST_NAMES
+        elif name.lower().endswith('firstname') or name.lower() in ('middlename', 'alias'):
+            pool = FIRST_NAMES
+        else:
+            pool = pools.setdefault(name, string_pool(rng, length))
+        values = [pool[i] for i in rng.integers(0, len(pool), count)]
+    if column['nullable']:
+        for i in np.flatnonzero(rng.random(count) < NULL_FRACTION):
+            values[i] = None
+    return values
+
+def generate_source(path, table_name, columns, key_column, rows, seed=42):
+    """Write `rows` synthetic rows shaped like the DDL into a SQLite file (reused when it already exists)"""
+    if os.path.exists(path):
+        logger.info(f"Reusing synthetic source {path}")
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    rng = np.random.default_rng(seed)
+    pools = {}
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    column_defs = ', '.join(f'[{c["name"]}] {sqlite_type(c)}' for c in columns)
+    conn.execute(f"CREATE TABLE [{table_name}] ({column_defs}, PRIMARY KEY ([{key_column}]))")
+    placeholders = ', '.join(['?'] * len(columns))
+    started = time.perf_counter()
+    for start in range(0, rows, GENERATE_CHUNK):
+        keys = np.arange(start + 1, min(start + GENERATE_CHUNK, rows) + 1)
+        data = [column_values(c, keys, rng, pools, c['name'] == key_column) for c in columns]
+        conn.executemany(f"INSERT INTO [{table_name}] VALUES ({placeholders})", list(zip(*data)))
+        conn.commit()
+        logger.info(f"Generated {start + len(keys)} / {rows} rows of {table_name}")
+    conn.close()
+    os.replace(tmp_path, path)
+    logger.info(f"Synthetic source {path} ready in {time.perf_counter() - started:.1f}s")
+
+def open_source(path):
+    """Connection on which the synthetic file is schema `dbo`, so production queries run unchanged"""
+    conn = sqlite3.connect(':memory:', detect_types=sqlite3.PARSE_DECLTYPES)
+    conn.execute("ATTACH DATABASE ? AS dbo", (path,))
+    return conn
+
+def open_sqlite_sink(path, table_name):
+    """Fresh SQLite target table with the DDL's columns"""
+    sink = SqliteSink(path)
+    sink.conn.execute(f"DROP TABLE IF EXISTS [{table_name}]")
+    sink.ensure_table(table_name)
+    return sink
+
+def bench_mysql_config():
+    """Config of the scratch MySQL database in BENCH_MYSQL_* (never the production target)"""
+    mysql_config = {
+        'host': os.getenv('BENCH_MYSQL_HOST'),
+        'user': os.getenv('BENCH_MYSQL_USER'),
+        'password': os.getenv('BENCH_MYSQL_PASSWORD') or '',
+        'database': os.getenv('BENCH_MYSQL_DATABASE'),
+        'compress': False
+    }
+    if not mysql_config['host'] or not mysql_config['database']:
+        raise SystemExit("Set BENCH_MYSQL_HOST/USER/PASSWORD/DATABASE to a scratch MySQL database for --sink mysql")
+    return mysql_config
+
+def open_mysql_sink(table_name):
+    """Connection, engine and config for a local MySQL benchmark database (never the production target)"""
+    from connections import get_mysql_connection, get_mysql_engine
+    mysql_config = bench_mysql_config()
+    conn = get_mysql_connection(mysql_config['host'], mysql_config['user'], mysql_config['password'],
+                                mysql_config['database'])
+    _, create_statement = find_create_table(table_name)
+    cursor = conn.cursor()
+    cursor.execute(f"DROP TABLE IF EXISTS `{table_name}`")
+    cursor.execute(create_statement.rstrip().rstrip(';'))
+    conn.commit()
+    cursor.close()
+    return conn, get_mysql_engine(mysql_config), mysql_config
+
+def seed_reference_tables(source_path, sink_kind, table_name, names):
+    """Fill stand-ins for the target tables the cleaning looks IDs up in with every ID the source references"""
+    lookups = [lookup for lookup in REFERENCE_LOOKUPS.get(table_name, []) if lookup[0] in names]
+    if not lookups:
+        return
+    source = open_source(source_path)
+    if sink_kind == 'mysql':
+        from connections import get_mysql_connection
+        mysql_config = bench_mysql_config()
+        conn = get_mysql_connection(mysql_config['host'], mysql_config['user'], mysql_config['password'],
+                                    mysql_config['database'])
+        placeholder = '%s'
+    else:
+        os.makedirs(BENCH_DIR, exist_ok=True)
+        conn = sqlite3.connect(SQLITE_SINK_PATH)
+        placeholder = '?'
+    try:
+        cursor = conn.cursor()
+        if sink_kind == 'mysql':
+            cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+        for column, referenced_table, referenced_column in lookups:
+            ids = [(row[0],) for row in source.execute(
+                f"SELECT DISTINCT [{column}] FROM dbo.[{table_name}] WHERE [{column}] IS NOT NULL"
+            )]
+            cursor.execute(f"DROP TABLE IF EXISTS `{referenced_table}`")
+            cursor.execute(f"CREATE TABLE `{referenced_table}` (`{referenced_column}` INT NOT NULL PRIMARY KEY)")
+            cursor.executemany(
+                f"INSERT INTO `{referenced_table}` (`{referenced_column}`) VALUES ({placeholder})", ids
+            )
+            conn.commit()
+            logger.info(f"Seeded {len(ids)} {referenced_table}.{referenced_column} values for cleaning {table_name}")
+        cursor.close()
+    finally:
+        conn.close()
+        source.close()
+
+def run_pandas(metrics, source, sink, sink_kind, table_name, columns, key_column, sizer):
+    """extract -> clean -> load through the table module's own fetch_data and loader"""
+    names = [c['name'] for c in columns]
+    module = importlib.import_module(TABLES[table_name]['module']) if table_name in TABLES else None
+    with metrics.stage('extract') as stage:
+        if module is None:
+            from extract_cache import read_sql_cached
+            column_str = ', '.join(f'[{col}]' for col in names)
+            df = read_sql_cached(source, f"SELECT {column_str} FROM dbo.[{table_name}] ORDER BY [{key_column}]", names)
+        elif table_name == 'Enrollment':
+            df = module.fetch_data(source, table_name, names, order_by=key_column)
+        elif table_name == 'Person':
+            # Clean against the Identity/Users stand-ins seeded in the sink
+            df = module.fetch_data(source, sink[0] if sink_kind == 'mysql' else sink.conn, 'dbo', table_name, names,
+                                   order_by=key_column)
+        else:
+            df = module.fetch_data(source, 'dbo', table_name, names, order_by=key_column)
+        stage.rows += len(df)
+        stage.bytes += int(df.memory_usage(deep=True).sum())
+    with metrics.stage('load') as stage:
+        if sink_kind == 'mysql':
+            conn, engine, mysql_config = sink
+            if module is None:
+                raise SystemExit(f"--path pandas --sink mysql needs a table with a loader module ({sorted(TABLES)})")
+            if table_name == 'Enrollment':
+                module.load_data_to_mysql(conn, mysql_config, table_name, df, names, truncate=True,
+                                          order_by=key_column, sizer=sizer)
+            else:
+                module.insert_data(conn, engine, table_name, df, names, truncate=True, order_by=key_column, sizer=sizer)
+        else:
+            # The production sink loop; Arrow hands sqlite3 datetime objects where pandas has Timestamps
+            batches = pa.Table.from_pandas(df, preserve_index=False).to_batches()
+            sink.write_batches(table_name, names, batches, key_column, sizer=sizer)
+        stage.rows += len(df)
+
+def run_passthrough(metrics, source, sink, sink_kind, table_name, columns, key_column, sizer):
+    """extract -> (clean ->) load through the same source/sink adapters and batch cleaner as production"""
+    names = [c['name'] for c in columns]
+    module = importlib.import_module(TABLES[table_name]['module']) if table_name in TABLES else None
+    make_batch_cleaner = getattr(module, 'make_batch_cleaner', None)
+    with metrics.stage('load') as stage:
+        target = MySqlSink(sink[0]) if sink_kind == 'mysql' else sink
+        clean_batch = None
+        if make_batch_cleaner is not None:
+            clean_batch = make_batch_cleaner(sink[0] if sink_kind == 'mysql' else sink.conn, names)
+        stage.rows += copy_table(SqlServerSource(source, 'dbo'), target, table_name, names, key_column,
+                                 clean_batch=clean_batch, sizer=sizer)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark extract -> clean -> load on synthetic Skyline-shaped data")
+    parser.add_argument('tables', nargs='+', help="Tables from skyline_staging_DDL_structure.sql or skyline_view_table_DDL.sql")
+    parser.add_argument('--rows', type=int, default=100000, help="Synthetic rows per table (100k-10M)")
+    parser.add_argument('--path', choices=['pandas', 'passthrough'], default='pandas')
+    parser.add_argument('--sink', choices=['sqlite', 'mysql'], default='sqlite',
+                        help="sqlite: local file; mysql: the scratch database in BENCH_MYSQL_*")
+    parser.add_argument('--fixed-batch', type=int, help="Disable adaptive sizing and write this many rows per batch")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    results = []
+    for table_name in args.tables:
+        columns = parse_columns(table_name)
+        key_column = primary_key(table_name) or columns[0]['name']
+        source_path = os.path.join(BENCH_DIR, f"source_{table_name}_{args.rows}_{args.seed}.sqlite")
+        generate_source(source_path, table_name, columns, key_column, args.rows, seed=args.seed)
+        seed_reference_tables(source_path, args.sink, table_name, [c['name'] for c in columns])
+
+        label = f"bench-{args.path}-{args.sink}-{args.rows}"
+        metrics = start_run(table_name, mode=label)
+        source = open_source(source_path)
+        sink = None
+        try:
+            with metrics.stage('connect'):
+                if args.sink == 'mysql':
+                    sink = open_mysql_sink(table_name)
+                else:
+                    sink = open_sqlite_sink(SQLITE_SINK_PATH, table_name)
+            if args.fixed_batch:
+                sizer = BatchSizer(table_name, args.fixed_batch, adaptive=False)
+            else:
+                sizer = BatchSizer(table_name, adaptive=True)
+            runner = run_pandas if args.path == 'pandas' else run_passthrough
+            runner(metrics, source, sink, args.sink, table_name, columns, key_column, sizer)
+            sizer.save()
+            metrics.status = 'success'
+        finally:
+            source.close()
+            if sink is not None:
+                (sink[0] if args.sink == 'mysql' else sink).close()
+            summary = finish_run(table_name)
+        if summary:
+            results.append(summary)
+
+    print(f"\n{'table':<18} {'mode':<32} {'rows':>9} {'seconds':>8} {'rows/s':>9} {'extract s':>10} {'load s':>8} "
+          f"{'p50 batch s':>12} {'rss MB':>7}")
+    for summary in results:
+        stages = summary['stages']
+        print(
+            f"{summary['table']:<18} {summary['mode']:<32} {summary['rows']:>9} {summary['duration_seconds']:>8.1f} "
+            f"{summary['rows'] / summary['duration_seconds'] if summary['duration_seconds'] else 0:>9.0f} "
+            f"{stages.get('extract', {}).get('seconds', 0):>10.2f} {stages.get('load', {}).get('seconds', 0):>8.2f} "
+            f"{summary['batch_latency_seconds'].get('0.5', 0):>12.4f} {summary['peak_rss_mb'] or 0:>7.0f}"
+        )
+    print(f"\nBefore/after trend: ETL_STATE_DIR={os.environ['ETL_STATE_DIR']} python run_history.py report")
+
+if __name__ == "__main__":
+    main()
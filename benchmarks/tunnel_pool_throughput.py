@@ -0,0 +1,132 @@
+import logging
+import argparse
+import itertools
+import threading
+import time
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from connections import load_config, get_sql_server_connection
+from tunnel_supervisor import TunnelSupervisor
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def get_key_bounds(sql_conn, table_name, key_column):
+    """Return MIN/MAX of the key column on SQL Server"""
+    cursor = sql_conn.cursor()
+    cursor.execute(f"SELECT MIN([{key_column}]), MAX([{key_column}]) FROM dbo.[{table_name}]")
+    lo, hi = cursor.fetchone()
+    cursor.close()
+    return int(lo), int(hi)
+
+def read_partition(tunnel, sql_server_config, table_name, key_column, lo, hi, fetch_size, totals, lock):
+    """Stream one key range through the given tunnel and add its row and byte counts to totals"""
+    sql_conn = get_sql_server_connection(
+        tunnel,
+        sql_server_config['database'],
+        sql_server_config['user'],
+        sql_server_config['password']
+    )
+    rows = 0
+    approx_bytes = 0
+    try:
+        cursor = sql_conn.cursor()
+        cursor.execute(f"SELECT * FROM dbo.[{table_name}] WHERE [{key_column}] BETWEEN ? AND ?", lo, hi)
+        while True:
+            batch = cursor.fetchmany(fetch_size)
+            if not batch:
+                break
+            rows += len(batch)
+            approx_bytes += sum(len(str(value)) for row in batch for value in row if value is not None)
+        cursor.close()
+    finally:
+        sql_conn.close()
+    with lock:
+        totals['rows'] += rows
+        totals['bytes'] += approx_bytes
+
+def start_tunnels(ssh_config, count):
+    """Start count independent supervised tunnels (one SSH transport each)"""
+    tunnels = []
+    try:
+        for _ in range(count):
+            tunnels.append(TunnelSupervisor(ssh_config).start())
+    except Exception:
+        stop_tunnels(tunnels)
+        raise
+    return tunnels
+
+def stop_tunnels(tunnels):
+    for tunnel in tunnels:
+        tunnel.stop()
+
+def run_pool(ssh_config, sql_server_config, table_name, key_column, pool_size, partitions, fetch_size, bounds):
+    """Extract the table in parallel partitions spread round-robin over pool_size tunnels"""
+    tunnels = start_tunnels(ssh_config, pool_size)
+    try:
+        next_tunnel = itertools.cycle(tunnels)
+        lo, hi = bounds
+        step = -(-(hi - lo + 1) // partitions)
+        totals = {'rows': 0, 'bytes': 0}
+        lock = threading.Lock()
+        threads = []
+        start_time = time.perf_counter()
+        for part_lo in range(lo, hi + 1, step):
+            thread = threading.Thread(
+                target=read_partition,
+                args=(next(next_tunnel), sql_server_config, table_name, key_column,
+                      part_lo, min(part_lo + step - 1, hi), fetch_size, totals, lock)
+            )
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start_time
+        return totals['rows'], totals['bytes'], elapsed
+    finally:
+        stop_tunnels(tunnels)
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure aggregate extract throughput for K = 1..N parallel SSH tunnels")
+    parser.add_argument('--table', default='Enrollment')
+    parser.add_argument('--key', default='enrollmentID')
+    parser.add_argument('--max-tunnels', type=int, default=4)
+    parser.add_argument('--partitions', type=int, default=8)
+    parser.add_argument('--fetch-size', type=int, default=5000)
+    args = parser.parse_args()
+
+    ssh_config, sql_server_config, _ = load_config()
+
+    probe_tunnel = TunnelSupervisor(ssh_config).start()
+    try:
+        probe_conn = get_sql_server_connection(
+            probe_tunnel,
+            sql_server_config['database'],
+            sql_server_config['user'],
+            sql_server_config['password']
+        )
+        bounds = get_key_bounds(probe_conn, args.table, args.key)
+        probe_conn.close()
+    finally:
+        probe_tunnel.stop()
+
+    results = []
+    for pool_size in range(1, args.max_tunnels + 1):
+        rows, approx_bytes, elapsed = run_pool(ssh_config, sql_server_config, args.table, args.key,
+                                               pool_size, args.partitions, args.fetch_size, bounds)
+        results.append((pool_size, rows, approx_bytes, elapsed))
+        logger.info(
+            f"K={pool_size}: {rows} rows in {elapsed:.1f}s, {rows / elapsed:.0f} rows/s, "
+            f"{approx_bytes / elapsed / 1048576:.2f} MiB/s"
+        )
+
+    baseline = results[0][1] / results[0][3]
+    for pool_size, rows, approx_bytes, elapsed in results:
+        logger.info(f"K={pool_size}: {rows / elapsed / baseline:.2f}x single-tunnel throughput")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import logging
+import argparse
+import time
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from connections import load_config, get_sql_server_connection
+from tunnel_supervisor import TunnelSupervisor, TUNNEL_PROFILES
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def run_extract(ssh_config, sql_server_config, profile, table_name, limit, fetch_size):
+    """Stream the same extract through a tunnel built with the given profile"""
+    tunnel = TunnelSupervisor(ssh_config, profile=profile).start()
+    try:
+        sql_conn = get_sql_server_connection(
+            tunnel,
+            sql_server_config['database'],
+            sql_server_config['user'],
+            sql_server_config['password']
+        )
+        top = f"TOP ({int(limit)}) " if limit else ""
+        rows = 0
+        approx_bytes = 0
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        cursor = sql_conn.cursor()
+        cursor.execute(f"SELECT {top}* FROM dbo.[{table_name}]")
+        while True:
+            batch = cursor.fetchmany(fetch_size)
+            if not batch:
+                break
+            rows += len(batch)
+            approx_bytes += sum(len(str(value)) for row in batch for value in row if value is not None)
+        cursor.close()
+        sql_conn.close()
+        return rows, approx_bytes, time.perf_counter() - wall_start, time.process_time() - cpu_start
+    finally:
+        tunnel.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare SSH tunnel compression/cipher profiles on the same extract")
+    parser.add_argument('--table', default='Enrollment')
+    parser.add_argument('--limit', type=int, default=200000, help="Rows to pull per profile (0 = whole table)")
+    parser.add_argument('--fetch-size', type=int, default=5000)
+    parser.add_argument('--profiles', nargs='+', default=sorted(TUNNEL_PROFILES), choices=sorted(TUNNEL_PROFILES))
+    args = parser.parse_args()
+
+    ssh_config, sql_server_config, _ = load_config()
+
+    results = []
+    for profile in args.profiles:
+        rows, approx_bytes, wall, cpu = run_extract(ssh_config, sql_server_config, profile,
+                                                    args.table, args.limit, args.fetch_size)
+        results.append((profile, rows / wall))
+        logger.info(
+            f"{profile}: {rows} rows in {wall:.1f}s, {rows / wall:.0f} rows/s, "
+            f"{approx_bytes / wall / 1048576:.2f} MiB/s, client CPU {cpu:.1f}s"
+        )
+
+    best_profile, best_rate = max(results, key=lambda result: result[1])
+    logger.info(f"Fastest profile: {best_profile} ({best_rate:.0f} rows/s); set SSH_TUNNEL_PROFILE={best_profile}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+import logging
+from etl_state import load_state, locked_state
+
+logger = logging.getLogger(__name__)
+
+STATE_NAME = 'fingerprints'
+
+def get_source_fingerprint(sql_conn, schema, table_name, sql_columns):
+    """Fetch row count and CHECKSUM_AGG over the projected columns from SQL Server"""
+    try:
+        column_str = ', '.join([f'[{col}]' for col in sql_columns])
+        cursor = sql_conn.cursor()
+        cursor.execute(f"SELECT COUNT_BIG(*), CHECKSUM_AGG(BINARY_CHECKSUM({column_str})) FROM {schema}.[{table_name}]")
+        row_count, checksum = cursor.fetchone()
+        cursor.close()
+        fingerprint = {'row_count': int(row_count), 'checksum': checksum}
+        logger.info(f"Source fingerprint for {schema}.{table_name}: {fingerprint}")
+        return fingerprint
+    except Exception as e:
+        logger.error(f"Failed to fetch fingerprint for {schema}.{table_name}: {str(e)}")
+        raise
+
+def source_unchanged(mysql_conn, table_name, fingerprint):
+    """True when the fingerprint matches the last successful load and the target still holds those rows"""
+    stored = load_state(STATE_NAME).get(table_name)
+    if stored != fingerprint:
+        return False
+    # Guard against a target that was truncated or partially loaded since
+    cursor = mysql_conn.cursor()
+    cursor.execute(f"SELECT COUNT(*) FROM `{table_name}`")
+    target_count = cursor.fetchone()[0]
+    cursor.close()
+    if target_count != fingerprint['row_count']:
+        logger.info(f"Target '{table_name}' has {target_count} rows, expected {fingerprint['row_count']}; reloading")
+        return False
+    return True
+
+def save_fingerprint(table_name, fingerprint):
+    """Record the fingerprint of a successful load"""
+    with locked_state(STATE_NAME) as state:
+        state[table_name] = fingerprint
+    logger.info(f"Saved fingerprint for '{table_name}'")
@@ -0,0 +1,30 @@
+import logging
+import time
+from etl_state import load_state, locked_state
+
+logger = logging.getLogger(__name__)
+
+STATE_NAME = 'checkpoints'
+
+def save_checkpoint(table_name, last_key, rows_committed):
+    """Record the highest key committed so far for a table load"""
+    with locked_state(STATE_NAME) as state:
+        state[table_name] = {'last_key': int(last_key), 'rows_committed': int(rows_committed), 'updated': time.time()}
+
+def get_resume_key(table_name):
+    """Return the last committed key for a table, or None when there is nothing to resume"""
+    checkpoint = load_state(STATE_NAME).get(table_name)
+    if not checkpoint:
+        logger.info(f"No checkpoint for '{table_name}'; running a full load")
+        return None
+    logger.info(
+        f"Resuming '{table_name}' after key {checkpoint['last_key']} "
+        f"({checkpoint['rows_committed']} rows committed by the interrupted run)"
+    )
+    return checkpoint['last_key']
+
+def clear_checkpoint(table_name):
+    """Forget the checkpoint of a table once its load has finished or restarts from scratch"""
+    if table_name in load_state(STATE_NAME):
+        with locked_state(STATE_NAME) as state:
+            state.pop(table_name, None)
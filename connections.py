@@ -0,0 +1,150 @@
+import pymysql
+import mysql.connector
+import pyodbc
+import logging
+import urllib.parse
+from sqlalchemy import create_engine
+from dotenv import load_dotenv
+from tunnel_supervisor import TunnelSupervisor
+from tracing import span
+import os
+
+logger = logging.getLogger(__name__)
+
+def load_config():
+    """Read SSH, SQL Server and MySQL settings from the .env file"""
+    load_dotenv()
+    ssh_config = {
+        'host': os.getenv('SSH_HOST'),
+        'username': os.getenv('SSH_USERNAME'),
+        'password': os.getenv('SSH_PASSWORD') or None,  # Handle empty password
+        'private_key_path': os.getenv('SSH_PRIVATE_KEY_PATH'),
+        'remote_host': os.getenv('SSH_REMOTE_HOST'),
+        'remote_port': int(os.getenv('SSH_REMOTE_PORT'))
+    }
+    sql_server_config = {
+        'database': os.getenv('SQL_SERVER_DATABASE'),
+        'user': os.getenv('SQL_SERVER_USER'),
+        'password': os.getenv('SQL_SERVER_PASSWORD')
+    }
+    mysql_config = {
+        'host': os.getenv('MYSQL_HOST'),
+        'user': os.getenv('MYSQL_USER'),
+        'password': os.getenv('MYSQL_PASSWORD'),
+        'database': os.getenv('MYSQL_DATABASE'),
+        # Compressed client protocol for the cross-region RDS link
+        'compress': (os.getenv('MYSQL_COMPRESS') or '').lower() in ('1', 'true', 'yes')
+    }
+    return ssh_config, sql_server_config, mysql_config
+
+def get_sql_server_connection(tunnel, sql_server_db, sql_server_user, sql_server_password):
+    """Create connection to SQL Server through SSH tunnel"""
+    try:
+        conn_str = (
+            f"DRIVER={{ODBC Driver 17 for SQL Server}};"
+            f"SERVER=127.0.0.1,{tunnel.local_bind_port};"
+            f"DATABASE={sql_server_db};"
+            f"UID={sql_server_user};"
+            f"PWD={sql_server_password}"
+        )
+        with span('get_sql_server_connection', cat='connect', port=tunnel.local_bind_port):
+            conn = pyodbc.connect(conn_str)
+        logger.info("Connected to SQL Server")
+        return conn
+    except Exception as e:
+        logger.error(f"Failed to connect to SQL Server: {str(e)}")
+        raise
+
+def reopen_sql_server_connection(tunnel, sql_conn, sql_server_config):
+    """Replace a SQL Server connection that died with the tunnel by a fresh one"""
+    try:
+        sql_conn.close()
+    except Exception as e:
+        logger.warning(f"Ignoring error while closing dead SQL Server connection: {str(e)}")
+    return get_sql_server_connection(
+        tunnel,
+        sql_server_config['database'],
+        sql_server_config['user'],
+        sql_server_config['password']
+    )
+
+def get_mysql_connection(mysql_host, mysql_user, mysql_password, mysql_db, compress=False):
+    """Create connection to MySQL, optionally with the compressed client protocol"""
+    try:
+        with span('get_mysql_connection', cat='connect', host=mysql_host, compress=compress):
+            if compress:
+                # PyMySQL does not implement protocol compression; mysql-connector does
+                conn = mysql.connector.connect(
+                    host=mysql_host,
+                    user=mysql_user,
+                    password=mysql_password,
+                    database=mysql_db,
+                    charset='utf8mb4',
+                    compress=True
+                )
+            else:
+                conn = pymysql.connect(
+                    host=mysql_host,
+                    user=mysql_user,
+                    password=mysql_password,
+                    database=mysql_db
+                )
+        logger.info(f"Connected to MySQL ({'compressed' if compress else 'uncompressed'} protocol)")
+        return conn
+    except Exception as e:
+        logger.error(f"Failed to connect to MySQL: {str(e)}")
+        raise
+
+def get_unbuffered_cursor(mysql_conn):
+    """Return a cursor that streams results instead of buffering them client-side"""
+    if isinstance(mysql_conn, pymysql.connections.Connection):
+        return mysql_conn.cursor(pymysql.cursors.SSCursor)
+    return mysql_conn.cursor(buffered=False)
+
+def get_mysql_engine(mysql_config):
+    """Create SQLAlchemy engine for MySQL with URL-encoded password"""
+    encoded_password = urllib.parse.quote(mysql_config['password'])
+    if mysql_config.get('compress'):
+        return create_engine(
+            f"mysql+mysqlconnector://{mysql_config['user']}:{encoded_password}@{mysql_config['host']}/{mysql_config['database']}?charset=utf8mb4",
+            connect_args={'compress': True}
+        )
+    return create_engine(
+        f"mysql+pymysql://{mysql_config['user']}:{encoded_password}@{mysql_config['host']}/{mysql_config['database']}?charset=utf8mb4"
+    )
+
+def open_connections(ssh_config, sql_server_config, mysql_config):
+    """Open the SSH tunnel, the SQL Server connection and the MySQL connection"""
+    tunnel = TunnelSupervisor(ssh_config).start()
+    try:
+        sql_conn = get_sql_server_connection(
+            tunnel,
+            sql_server_config['database'],
+            sql_server_config['user'],
+            sql_server_config['password']
+        )
+        mysql_conn = get_mysql_connection(
+            mysql_config['host'],
+            mysql_config['user'],
+            mysql_config['password'],
+            mysql_config['database'],
+            compress=mysql_config['compress']
+        )
+    except Exception:
+        if 'sql_conn' in locals():
+            sql_conn.close()
+        tunnel.stop()
+        raise
+    return tunnel, sql_conn, mysql_conn
+
+def close_connections(tunnel, sql_conn, mysql_conn):
+    """Close connections opened by open_connections"""
+    if sql_conn is not None:
+        sql_conn.close()
+        logger.info("SQL Server connection closed")
+    if mysql_conn is not None:
+        mysql_conn.close()
+        logger.info("MySQL connection closed")
+    if tunnel is not None:
+        tunnel.stop()
+        logger.info("SSH tunnel closed")
@@ -0,0 +1,43 @@
+import os
+import re
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DDL_FILES = [
+    os.path.join(BASE_DIR, 'skyline_staging_DDL_structure.sql'),
+    os.path.join(BASE_DIR, 'skyline_view_table_DDL.sql'),
+]
+
+def find_create_table(table_name, ddl_path=None):
+    """Return (ddl_path, CREATE TABLE statement) for a table from the MySQL DDL files"""
+    for path in [ddl_path] if ddl_path else DDL_FILES:
+        with open(path, 'r', encoding='utf-8') as f:
+            ddl = f.read()
+        match = re.search(rf"CREATE TABLE `?{re.escape(table_name)}`?\s*\(.*?\n\)\s*ENGINE=\w+\s*;", ddl, re.S | re.I)
+        if match:
+            return path, match.group(0)
+    raise ValueError(f"No CREATE TABLE for '{table_name}' in {ddl_path or DDL_FILES}")
+
+def parse_columns(table_name, ddl_path=None):
+    """Return [{name, type, length, scale, nullable}] for a table's columns, in DDL order"""
+    _, statement = find_create_table(table_name, ddl_path)
+    body = statement[statement.index('(') + 1:statement.rindex(')')]
+    columns = []
+    for line in body.splitlines():
+        column = re.match(r"\s*`?(\w+)`?\s+(\w+)(?:\((\d+)(?:\s*,\s*(\d+))?\))?(.*)", line)
+        if column is None or column.group(1).upper() in ('CONSTRAINT', 'PRIMARY', 'UNIQUE', 'KEY', 'INDEX', 'FOREIGN'):
+            continue
+        rest = column.group(5).upper()
+        columns.append({
+            'name': column.group(1),
+            'type': column.group(2).lower(),
+            'length': int(column.group(3)) if column.group(3) else None,
+            'scale': int(column.group(4)) if column.group(4) else None,
+            'nullable': 'NOT NULL' not in rest,
+        })
+    return columns
+
+def primary_key(table_name, ddl_path=None):
+    """Return the single primary-key column of a table, or None"""
+    _, statement = find_create_table(table_name, ddl_path)
+    match = re.search(r"PRIMARY KEY\s*\(`?(\w+)`?\)", statement, re.I)
+    return match.group(1) if match else None
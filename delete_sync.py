@@ -0,0 +1,85 @@
+import logging
+from etl_logging import batch_log
+
+logger = logging.getLogger(__name__)
+
+def stream_source_keys(sql_conn, schema, table_name, key_column, fetch_size=50000):
+    """Yield primary keys from a SQL Server table in ascending order"""
+    cursor = sql_conn.cursor()
+    try:
+        cursor.execute(f"SELECT [{key_column}] FROM {schema}.[{table_name}] ORDER BY [{key_column}]")
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield row[0]
+    finally:
+        cursor.close()
+
+def stream_target_keys(mysql_conn, table_name, key_column, fetch_size=50000):
+    """Yield primary keys from a MySQL table in ascending order without buffering the result"""
+    from connections import get_unbuffered_cursor
+    cursor = get_unbuffered_cursor(mysql_conn)
+    try:
+        cursor.execute(f"SELECT `{key_column}` FROM `{table_name}` ORDER BY `{key_column}`")
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield row[0]
+    finally:
+        cursor.close()
+
+def sorted_anti_join(source_keys, target_keys):
+    """Return target keys that are absent from source, walking both sorted streams once"""
+    missing = []
+    source_iter = iter(source_keys)
+    source_key = next(source_iter, None)
+    for target_key in target_keys:
+        while source_key is not None and source_key < target_key:
+            source_key = next(source_iter, None)
+        if source_key is None or source_key != target_key:
+            missing.append(target_key)
+    return missing
+
+def delete_keys(mysql_conn, table_name, key_column, keys, batch_size=5000):
+    """Delete rows by primary key in batched DELETE ... WHERE key IN (...) statements"""
+    try:
+        cursor = mysql_conn.cursor()
+        cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+        total_deleted = 0
+        for start in range(0, len(keys), batch_size):
+            batch = keys[start:start + batch_size]
+            placeholders = ', '.join(['%s'] * len(batch))
+            cursor.execute(f"DELETE FROM `{table_name}` WHERE `{key_column}` IN ({placeholders})", batch)
+            total_deleted += cursor.rowcount
+            mysql_conn.commit()
+            logger.info("Deleted batch %d: %d keys from '%s'", start//batch_size + 1, len(batch), table_name,
+                        extra=batch_log(table_name))
+        cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+        mysql_conn.commit()
+        return total_deleted
+    except Exception as e:
+        logger.error(f"Failed to delete rows from '{table_name}': {str(e)}")
+        mysql_conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+def propagate_deletes(sql_conn, mysql_conn, schema, table_name, key_column, batch_size=5000):
+    """Remove MySQL rows whose primary key no longer exists in the SQL Server source"""
+    try:
+        source_keys = stream_source_keys(sql_conn, schema, table_name, key_column)
+        target_keys = stream_target_keys(mysql_conn, table_name, key_column)
+        stale_keys = sorted_anti_join(source_keys, target_keys)
+        logger.info(f"Found {len(stale_keys)} rows in '{table_name}' deleted at source")
+        if not stale_keys:
+            return 0
+        deleted = delete_keys(mysql_conn, table_name, key_column, stale_keys, batch_size=batch_size)
+        logger.info(f"Propagated {deleted} deletes to '{table_name}'")
+        return deleted
+    except Exception as e:
+        logger.error(f"Failed to propagate deletes for '{table_name}': {str(e)}")
+        raise
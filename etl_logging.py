@@ -0,0 +1,79 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+# Per-batch INFO lines are passed at most once per interval per table; warnings and errors always pass
+BATCH_LOG_INTERVAL = float(os.getenv('ETL_BATCH_LOG_INTERVAL') or 5.0)
+# Tag per-batch log calls with extra=batch_log(table_name) so the rate limit applies to them
+BATCH_TABLE = 'batch_table'
+
+_listener = None
+
+def batch_log(table_name):
+    """extra= for a per-batch log line of table_name"""
+    return {BATCH_TABLE: table_name}
+
+class BatchRateLimit(logging.Filter):
+    """Drops per-batch INFO lines beyond one per interval per table, noting how many were skipped"""
+
+    def __init__(self, interval=BATCH_LOG_INTERVAL):
+        super().__init__()
+        self.interval = interval
+        self.last_passed = {}
+        self.suppressed = {}
+
+    def filter(self, record):
+        table_name = getattr(record, BATCH_TABLE, None)
+        if table_name is None or record.levelno >= logging.WARNING:
+            return True
+        now = time.monotonic()
+        if now - self.last_passed.get(table_name, float('-inf')) < self.interval:
+            self.suppressed[table_name] = self.suppressed.get(table_name, 0) + 1
+            return False
+        self.last_passed[table_name] = now
+        skipped = self.suppressed.pop(table_name, 0)
+        if skipped:
+            record.msg = f"{record.msg} (+%d batch lines not shown)"
+            record.args = (record.args or ()) + (skipped,)
+        return True
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves %-formatting to the listener thread.
+
+    The stock handler formats every record in the calling thread before enqueueing it;
+    here only records with a traceback are rendered there (the frames will not survive).
+    """
+
+    def prepare(self, record):
+        if record.exc_info:
+            return super().prepare(record)
+        return record
+
+def setup_logging(level=logging.INFO):
+    """Send all logging through a queue to a background writer thread (once per process).
+
+    The loops only append records to the queue; the listener thread formats them and does
+    the console I/O, so a slow console (Windows) never stalls extraction or loading.
+    """
+    global _listener
+    if _listener is not None:
+        return
+    log_queue = queue.SimpleQueue()
+    console = logging.StreamHandler(sys.stderr)
+    console.setFormatter(logging.Formatter(LOG_FORMAT))
+    handler = LazyQueueHandler(log_queue)
+    handler.addFilter(BatchRateLimit())
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+    _listener = logging.handlers.QueueListener(log_queue, console, respect_handler_level=True)
+    _listener.start()
+    # Flush whatever is still queued when the script exits
+    atexit.register(_listener.stop)
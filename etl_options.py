@@ -0,0 +1,141 @@
+import argparse
+import datetime
+
+LOAD_MODES = ['truncate', 'upsert', 'merge']
+UNITS_MB = {'k': 1 / 1024, 'm': 1, 'g': 1024, 't': 1024 ** 2}
+
+def parse_memory(value):
+    """argparse type for sizes such as 3G, 3072M or 3072 (MiB); returns MiB"""
+    text = value.strip().lower().rstrip('ib')
+    unit = UNITS_MB.get(text[-1:]) if text else None
+    try:
+        mb = float(text[:-1] if unit else text) * (unit or 1)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid memory size '{value}' (use e.g. 3G or 3072M)")
+    if mb <= 0:
+        raise argparse.ArgumentTypeError(f"Memory size must be positive, not '{value}'")
+    return mb
+
+def parse_since(value):
+    """argparse type for an ISO date or datetime such as 2024-08-01 or 2024-08-01T06:30:00.250"""
+    try:
+        return datetime.datetime.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid date/time '{value}' (use e.g. 2024-08-01 or 2024-08-01T06:30:00)")
+
+def parse_key_range(value):
+    """argparse type for an inclusive key range LO:HI; returns (lo, hi)"""
+    try:
+        lo, hi = (int(part) for part in value.split(':'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid key range '{value}' (use LO:HI, e.g. 1:50000)")
+    if lo > hi:
+        raise argparse.ArgumentTypeError(f"Key range '{value}' is empty")
+    return lo, hi
+
+def extract_conditions(args, key_column, watermark_column='modifiedDate'):
+    """SQL Server WHERE conditions selecting the subset named by --since and --key-range.
+
+    The values are parsed by argparse, so they are inlined like the resume key is.
+    """
+    conditions = []
+    if getattr(args, 'since', None) is not None:
+        conditions.append(f"[{watermark_column}] > CAST('{args.since.isoformat()}' AS DATETIME2(7))")
+    if args.key_range is not None:
+        lo, hi = args.key_range
+        conditions.append(f"[{key_column}] BETWEEN {lo} AND {hi}")
+    return conditions
+
+def parse_table_args(table_name, argv=None, passthrough=False, watermark=False):
+    """Parse the command-line options shared by the per-table load scripts.
+
+    passthrough=True adds --passthrough for tables whose rows can be copied without pandas.
+    watermark=True adds --since for tables with a modifiedDate column.
+    """
+    parser = argparse.ArgumentParser(description=f"Load {table_name} from SQL Server into MySQL")
+    parser.add_argument(
+        '--mode',
+        choices=LOAD_MODES,
+        default='truncate',
+        help="truncate: empty the table and append everything; "
+             "upsert: INSERT ... ON DUPLICATE KEY UPDATE on the primary key; "
+             "merge: stage into a temp table, then one set-based upsert"
+    )
+    parser.add_argument(
+        '--propagate-deletes',
+        action='store_true',
+        help="After loading, delete MySQL rows whose key no longer exists in SQL Server"
+    )
+    parser.add_argument(
+        '--force',
+        action='store_true',
+        help="Reload even when the change probe reports the source is unchanged"
+    )
+    parser.add_argument(
+        '--cache',
+        action='store_true',
+        help="Keep extracted chunks in the local Parquet cache and reuse them on reruns"
+    )
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help="Continue an interrupted load after its last checkpointed key, without truncating"
+    )
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help="cProfile and tracemalloc each stage; writes .prof files and a report under the metrics directory"
+    )
+    parser.add_argument(
+        '--trace',
+        action='store_true',
+        help="Record spans (tunnel, connections, extract chunks, write batches, retries) as Chrome trace-event JSON"
+    )
+    parser.add_argument(
+        '--memory-budget',
+        type=parse_memory,
+        metavar='SIZE',
+        help="Keep the job's RSS under SIZE (e.g. 3G): extract in budget-sized chunks instead of the whole table"
+    )
+    parser.add_argument(
+        '--key-range',
+        type=parse_key_range,
+        metavar='LO:HI',
+        help="Only extract and load rows whose key is between LO and HI (upsert and merge modes)"
+    )
+    if watermark:
+        parser.add_argument(
+            '--since',
+            type=parse_since,
+            metavar='DATETIME',
+            help="Only extract and load rows whose modifiedDate is later than DATETIME (upsert and merge modes)"
+        )
+    if passthrough:
+        parser.add_argument(
+            '--passthrough',
+            action='store_true',
+            help="Copy rows as Arrow record batches from fetchmany straight to executemany, "
+                 "without pandas (truncate and upsert modes only)"
+        )
+        parser.add_argument(
+            '--swap',
+            action='store_true',
+            help="Load into a shadow table and swap it in with one RENAME, so readers never see a half-loaded "
+                 "table (implies --passthrough; truncate mode only)"
+        )
+    args = parser.parse_args(argv)
+    if (getattr(args, 'since', None) is not None or args.key_range is not None) and args.mode == 'truncate':
+        # Truncating and then loading a subset would drop every other row
+        parser.error("--since and --key-range load a subset and need --mode upsert or merge")
+    if getattr(args, 'swap', False):
+        if args.mode != 'truncate' or args.resume:
+            parser.error("--swap replaces the whole table and needs --mode truncate without --resume")
+        args.passthrough = True
+    if getattr(args, 'passthrough', False) and args.mode == 'merge':
+        parser.error("--passthrough supports --mode truncate and upsert only")
+    if args.memory_budget and passthrough and args.mode != 'merge' and not args.passthrough:
+        # The pass-through path already streams record batches; it is the cheapest way to stay in budget
+        args.passthrough = True
+    if args.memory_budget and args.cache and not getattr(args, 'passthrough', False):
+        parser.error("--memory-budget reads key ranges page by page and cannot reuse a --cache extract")
+    return args
@@ -0,0 +1,77 @@
+import json
+import logging
+import os
+import tempfile
+from contextlib import contextmanager
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+# Small JSON documents that carry state between runs (fingerprints, checkpoints, ...)
+STATE_DIR = os.getenv('ETL_STATE_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'etl_state')
+
+def state_path(name):
+    """Return the path of a named state file"""
+    return os.path.join(STATE_DIR, f"{name}.json")
+
+def load_state(name):
+    """Load a named state document, or an empty dict if it does not exist yet"""
+    path = state_path(name)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable state file {path}: {str(e)}")
+        return {}
+
+@contextmanager
+def _file_lock(path):
+    """Exclusive lock on path's .lock file, shared by every process that updates path"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.lock", 'a+') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+def _write_state(path, data):
+    # A temp file of its own in the same directory, so concurrent writers never share one and the
+    # replace stays atomic
+    fd, tmp_path = tempfile.mkstemp(prefix=f"{os.path.basename(path)}.", suffix='.tmp', dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, default=str)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+@contextmanager
+def locked_state(name):
+    """Yield a named state document under its lock and write the changes back atomically.
+
+    Table jobs running in parallel (run_flow.py --workers) update their own entries of the
+    same documents; reading, changing and writing under one lock keeps every entry.
+    """
+    path = state_path(name)
+    with _file_lock(path):
+        state = load_state(name)
+        yield state
+        _write_state(path, state)
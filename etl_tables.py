@@ -0,0 +1,16 @@
+# Staging tables loaded by the per-table scripts, in the order of TO_run_1_by_1_flow.
+# 'cleaned' marks tables whose fetch_data rewrites values, so raw source rows
+# cannot be written to them directly. 'passthrough' marks tables whose script accepts --passthrough.
+# 'after' lists the tables whose load must finish first (the FK parents the flow order encodes;
+# Identity and Person reference each other, so the flow's Identity -> Person order is kept).
+TABLES = {
+    'Pronoun': {'module': 'pronoun', 'key': 'pronounID', 'cleaned': False, 'passthrough': True, 'after': []},
+    'Calendar': {'module': 'Calendar', 'key': 'calendarID', 'cleaned': False, 'passthrough': True, 'after': []},
+    'Identity': {'module': 'Identity', 'key': 'identityID', 'cleaned': False, 'passthrough': True,
+                 'after': ['Pronoun']},
+    'Person': {'module': 'person', 'key': 'personID', 'cleaned': True, 'passthrough': True, 'after': ['Identity']},
+    'Enrollment': {'module': 'Enrollment', 'key': 'enrollmentID', 'cleaned': False, 'passthrough': False,
+                   'after': ['Calendar', 'Person']},
+}
+
+FLOW_ORDER = ['Pronoun', 'Calendar', 'Identity', 'Person', 'Enrollment']
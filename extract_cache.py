@@ -0,0 +1,177 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from change_probe import get_source_fingerprint
+from arrow_batches import read_record_batches
+
+logger = logging.getLogger(__name__)
+
+# Extracted chunks are kept as zstd-compressed Parquet (requires pyarrow), one
+# directory per (table, projection, watermark). The _complete marker's mtime is
+# the last-used time for LRU eviction; the _writing marker's mtime is the writer's
+# heartbeat, touched after every chunk, so other jobs do not evict an entry mid-write.
+CACHE_DIR = os.getenv('ETL_CACHE_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'extract_cache')
+CACHE_MAX_BYTES = int(os.getenv('ETL_CACHE_MAX_BYTES') or 5 * 1024 ** 3)
+COMPLETE_MARKER = '_complete'
+WRITING_MARKER = '_writing'
+# A writer silent for this long (a crashed job) leaves an abandoned entry that may be evicted
+WRITER_TIMEOUT_SECONDS = 15 * 60
+
+def get_watermark(sql_conn, schema, table_name, sql_columns):
+    """Return a cheap value that changes whenever the source rows change"""
+    if 'modifiedDate' in sql_columns:
+        cursor = sql_conn.cursor()
+        cursor.execute(f"SELECT COUNT_BIG(*), MAX([modifiedDate]) FROM {schema}.[{table_name}]")
+        row_count, max_modified = cursor.fetchone()
+        cursor.close()
+        return {'row_count': int(row_count), 'max_modified': str(max_modified)}
+    return get_source_fingerprint(sql_conn, schema, table_name, sql_columns)
+
+def make_cache_key(table_name, sql_columns, watermark, layout='pandas', where=()):
+    """Build the cache key for a table, its column projection, its watermark, the chunk layout and row filter.
+
+    'pandas' chunks carry pandas-inferred dtypes (nullable ints as floats); 'arrow' chunks keep
+    the ODBC column types, so the two are cached separately.
+    """
+    payload = json.dumps([table_name, list(sql_columns), watermark, layout] + ([list(where)] if where else []),
+                         sort_keys=True, default=str)
+    return f"{table_name}-{hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]}"
+
+def entry_size(path):
+    """Total bytes of the files in a cache entry"""
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+def being_written(path):
+    """Whether a job is still writing the entry (its heartbeat is recent)"""
+    try:
+        return time.time() - os.path.getmtime(os.path.join(path, WRITING_MARKER)) < WRITER_TIMEOUT_SECONDS
+    except OSError:
+        return False
+
+def start_entry(path):
+    """Create an empty entry directory with a writer heartbeat"""
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+    open(os.path.join(path, WRITING_MARKER), 'w').close()
+
+def evict(max_bytes=CACHE_MAX_BYTES):
+    """Remove least recently used entries until the cache fits in max_bytes, never one still being written"""
+    if not os.path.isdir(CACHE_DIR):
+        return
+    entries = []
+    for name in os.listdir(CACHE_DIR):
+        path = os.path.join(CACHE_DIR, name)
+        marker = os.path.join(path, COMPLETE_MARKER)
+        try:
+            # Incomplete entries sort first, so abandoned partial extracts go before anything usable
+            last_used = os.path.getmtime(marker) if os.path.exists(marker) else 0
+            size = entry_size(path)
+        except OSError:
+            # Removed by another job's eviction meanwhile
+            continue
+        if last_used == 0 and being_written(path):
+            continue
+        entries.append((last_used, size, path))
+    total = sum(size for _, size, _ in entries)
+    for last_used, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+        logger.info(f"Evicted extract cache entry {os.path.basename(path)} ({size / 1048576:.1f} MiB)")
+
+def is_cached(cache_key):
+    """Whether a complete entry exists for the key"""
+    return cache_key is not None and os.path.exists(os.path.join(CACHE_DIR, cache_key, COMPLETE_MARKER))
+
+def read_cached(cache_key):
+    """Return the cached DataFrame for a key, or None if there is no complete entry"""
+    path = os.path.join(CACHE_DIR, cache_key)
+    marker = os.path.join(path, COMPLETE_MARKER)
+    if not os.path.exists(marker):
+        return None
+    chunk_files = sorted(name for name in os.listdir(path) if name.endswith('.parquet'))
+    if chunk_files:
+        df = pd.concat([pd.read_parquet(os.path.join(path, name)) for name in chunk_files], ignore_index=True)
+    else:
+        with open(marker, 'r', encoding='utf-8') as f:
+            df = pd.DataFrame(columns=json.load(f)['columns'])
+    os.utime(marker)
+    logger.info(f"Read {len(df)} rows from extract cache entry {cache_key}")
+    return df
+
+def read_sql_cached(sql_conn, query, sql_columns, cache_key=None, chunksize=50000):
+    """Run query through pandas, persisting each chunk to the extract cache when a key is given"""
+    if cache_key is None:
+        return pd.read_sql(query, sql_conn)
+    cached = read_cached(cache_key)
+    if cached is not None:
+        return cached
+
+    path = os.path.join(CACHE_DIR, cache_key)
+    start_entry(path)
+    caching = True
+    chunks = []
+    for chunk_num, chunk in enumerate(pd.read_sql(query, sql_conn, chunksize=chunksize)):
+        chunks.append(chunk)
+        if not caching:
+            continue
+        try:
+            chunk.to_parquet(os.path.join(path, f"chunk_{chunk_num:05d}.parquet"), compression='zstd', index=False)
+            os.utime(os.path.join(path, WRITING_MARKER))
+        except Exception as e:
+            logger.warning(f"Disabling extract cache for {cache_key}: {str(e)}")
+            shutil.rmtree(path, ignore_errors=True)
+            caching = False
+    df = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=sql_columns)
+    if caching:
+        with open(os.path.join(path, COMPLETE_MARKER), 'w', encoding='utf-8') as f:
+            json.dump({'columns': list(df.columns), 'rows': len(df), 'created': time.time()}, f)
+        os.remove(os.path.join(path, WRITING_MARKER))
+        logger.info(f"Cached {len(df)} rows in {len(chunks)} chunks as {cache_key}")
+        evict()
+    return df
+
+def read_batches_cached(sql_conn, query, sql_columns, cache_key=None, batch_size=50000):
+    """Yield Arrow record batches for query, persisting each one to the extract cache when a key is given"""
+    if cache_key is None:
+        yield from read_record_batches(sql_conn, query, batch_size=batch_size)
+        return
+    path = os.path.join(CACHE_DIR, cache_key)
+    marker = os.path.join(path, COMPLETE_MARKER)
+    if os.path.exists(marker):
+        os.utime(marker)
+        logger.info(f"Reading record batches from extract cache entry {cache_key}")
+        for name in sorted(name for name in os.listdir(path) if name.endswith('.parquet')):
+            yield from pq.ParquetFile(os.path.join(path, name)).iter_batches(batch_size=batch_size)
+        return
+
+    start_entry(path)
+    caching = True
+    rows = 0
+    chunk_num = -1
+    for chunk_num, batch in enumerate(read_record_batches(sql_conn, query, batch_size=batch_size)):
+        rows += batch.num_rows
+        if caching:
+            try:
+                pq.write_table(pa.Table.from_batches([batch]), os.path.join(path, f"chunk_{chunk_num:05d}.parquet"),
+                               compression='zstd')
+                os.utime(os.path.join(path, WRITING_MARKER))
+            except Exception as e:
+                logger.warning(f"Disabling extract cache for {cache_key}: {str(e)}")
+                shutil.rmtree(path, ignore_errors=True)
+                caching = False
+        yield batch
+    # Only a fully consumed extract is marked complete; abandoned ones are evicted first
+    if caching:
+        with open(marker, 'w', encoding='utf-8') as f:
+            json.dump({'columns': list(sql_columns), 'rows': rows, 'created': time.time()}, f)
+        os.remove(os.path.join(path, WRITING_MARKER))
+        logger.info(f"Cached {rows} rows in {chunk_num + 1} record batches as {cache_key}")
+        evict()
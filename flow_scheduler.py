@@ -0,0 +1,91 @@
+import os
+from etl_tables import TABLES, FLOW_ORDER
+from run_history import stage_rates
+
+# Seconds assumed for a table with neither a planner estimate nor run history
+DEFAULT_JOB_SECONDS = float(os.getenv('ETL_DEFAULT_JOB_SECONDS') or 60)
+
+def job_seconds(table_name, planned=None):
+    """Expected duration of one table job and its basis: the planner's estimate, the run-history median or the default"""
+    if planned:
+        return planned['seconds'], 'plan'
+    rates = stage_rates(table_name)
+    if rates:
+        return rates['duration_seconds'], f"median of {rates['runs']} runs"
+    return DEFAULT_JOB_SECONDS, 'default'
+
+def critical_path(durations, after):
+    """Each job's duration plus the longest chain of jobs that must wait for it"""
+    rank = {}
+    for table_name in reversed([t for t in FLOW_ORDER if t in durations]):
+        waiting = [t for t in durations if table_name in after[t]]
+        rank[table_name] = durations[table_name] + max((rank[t] for t in waiting), default=0.0)
+    return rank
+
+class Scheduler:
+    """
+    Longest-first list scheduling of table jobs over a fixed number of worker slots.
+
+    Ready jobs start in order of their critical path (own duration plus everything that waits on it), so
+    Enrollment's chain is started before Pronoun. When a longer job is only waiting on running parents, a free
+    slot is held for it and only jobs expected to finish before it becomes ready may use the slot meanwhile.
+    """
+    def __init__(self, durations, workers):
+        self.durations = dict(durations)
+        self.workers = max(1, workers)
+        # Parents outside this run (skipped or not selected) are already in place
+        self.after = {t: [p for p in TABLES[t]['after'] if p in durations] for t in durations}
+        self.rank = critical_path(self.durations, self.after)
+        self.pending = sorted(self.durations, key=lambda t: -self.rank[t])
+        self.running = {}
+        self.done = set()
+
+    def has_work(self):
+        return bool(self.pending or self.running)
+
+    def next_jobs(self, now):
+        """Start as many jobs as the free slots allow at time `now`; return their names"""
+        started = []
+        reservations = []
+        for table_name in list(self.pending):
+            free = self.workers - len(self.running)
+            if free <= 0:
+                break
+            parents = [p for p in self.after[table_name] if p not in self.done]
+            if parents:
+                if all(p in self.running for p in parents):
+                    ready_at = max(self.running[p] for p in parents)
+                    # A parent running past its estimate makes the hold open-ended; do not idle on it
+                    if ready_at > now:
+                        reservations.append(ready_at)
+                continue
+            if len(reservations) >= free and now + self.durations[table_name] > min(reservations):
+                continue
+            self.pending.remove(table_name)
+            self.running[table_name] = now + self.durations[table_name]
+            started.append(table_name)
+        return started
+
+    def finish(self, table_name):
+        """Mark a job finished so the jobs waiting on it become ready"""
+        del self.running[table_name]
+        self.done.add(table_name)
+
+    def cancel_pending(self):
+        """Drop the jobs not started yet; return their names"""
+        cancelled, self.pending = self.pending, []
+        return cancelled
+
+def simulate(durations, workers):
+    """Run the schedule on the estimated durations; return (makespan seconds, [(table, start, finish), ...])"""
+    scheduler = Scheduler(durations, workers)
+    now, timeline = 0.0, []
+    while scheduler.has_work():
+        for table_name in scheduler.next_jobs(now):
+            timeline.append((table_name, now, scheduler.running[table_name]))
+        if not scheduler.running:
+            break
+        table_name = min(scheduler.running, key=scheduler.running.get)
+        now = scheduler.running[table_name]
+        scheduler.finish(table_name)
+    return now, timeline
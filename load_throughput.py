@@ -0,0 +1,62 @@
+import logging
+import statistics
+import time
+from etl_state import load_state, locked_state
+
+logger = logging.getLogger(__name__)
+
+STATE_NAME = 'load_throughput'
+# Samples kept per table and protocol; older runs fall off the front
+MAX_SAMPLES = 50
+
+def protocol_label(compressed):
+    """Return the label that load samples are grouped under"""
+    return 'compressed' if compressed else 'uncompressed'
+
+def record_load(table_name, rows, wall_seconds, cpu_seconds, compressed, mode):
+    """Store one load's throughput, keyed by table and by whether the MySQL protocol was compressed"""
+    with locked_state(STATE_NAME) as state:
+        samples = state.setdefault(table_name, {}).setdefault(protocol_label(compressed), [])
+        samples.append({
+            'rows': int(rows),
+            'wall_seconds': round(wall_seconds, 3),
+            'cpu_seconds': round(cpu_seconds, 3),
+            'mode': mode,
+            'finished': time.time()
+        })
+        del samples[:-MAX_SAMPLES]
+    rate = rows / wall_seconds if wall_seconds > 0 else 0.0
+    logger.info(
+        f"Loaded {rows} rows into '{table_name}' in {wall_seconds:.1f}s ({rate:.0f} rows/s, "
+        f"{cpu_seconds:.1f}s CPU, {protocol_label(compressed)} protocol, mode {mode})"
+    )
+
+def summarize(table_name=None):
+    """Return {table: {protocol: {runs, median_rows_per_s, median_cpu_ms_per_1k_rows}}} from stored samples"""
+    state = load_state(STATE_NAME)
+    summary = {}
+    for table, by_protocol in state.items():
+        if table_name is not None and table != table_name:
+            continue
+        for label, samples in by_protocol.items():
+            samples = [s for s in samples if s['rows'] > 0 and s['wall_seconds'] > 0]
+            if not samples:
+                continue
+            summary.setdefault(table, {})[label] = {
+                'runs': len(samples),
+                'median_rows_per_s': statistics.median(s['rows'] / s['wall_seconds'] for s in samples),
+                'median_cpu_ms_per_1k_rows': statistics.median(1e6 * s['cpu_seconds'] / s['rows'] for s in samples)
+            }
+    return summary
+
+def main():
+    for table, by_protocol in sorted(summarize().items()):
+        for label, stats in sorted(by_protocol.items()):
+            print(
+                f"{table:<12} {label:<13} runs={stats['runs']:<3} "
+                f"{stats['median_rows_per_s']:>10.0f} rows/s  "
+                f"{stats['median_cpu_ms_per_1k_rows']:>8.1f} ms CPU per 1k rows"
+            )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import logging
+import pandas as pd
+from batch_sizer import estimate_row_bytes
+from run_history import last_stage_bytes_per_row
+from run_metrics import current_rss_mb
+
+logger = logging.getLogger(__name__)
+
+# Until a run has measured it, assume a DataFrame row costs this many times its INSERT
+# payload (object columns box every string); Arrow batches stay close to the wire size.
+PANDAS_BYTES_FACTOR = 4.0
+ARROW_BYTES_FACTOR = 1.5
+# Share of the budget one extract chunk may hold; the rest covers the interpreter, the
+# drivers and the copies to_sql/executemany make of each write batch
+CHUNK_SHARE = 0.25
+# Halve the next chunk when RSS passes this share of the budget
+RSS_HEADROOM = 0.85
+MIN_CHUNK_ROWS = 1000
+MAX_CHUNK_ROWS = 500000
+
+class MemoryBudget:
+    """Plans extract chunk sizes and job concurrency so a table job stays within budget_mb of RSS.
+
+    The first chunk is sized from the bytes per row the last run of the same path measured
+    (or the DDL estimate); every later chunk is resized from the footprint of the one before,
+    and halved whenever RSS nears the budget, so a job degrades to smaller batches instead of
+    being OOM-killed.
+    """
+
+    def __init__(self, table_name, budget_mb, passthrough=False):
+        self.table_name = table_name
+        self.budget_mb = budget_mb
+        self.passthrough = passthrough
+
+    def bytes_per_row(self):
+        """Measured in-memory bytes per row from the run history, or a DDL-based estimate"""
+        measured = last_stage_bytes_per_row(self.table_name, passthrough=self.passthrough)
+        if measured:
+            return measured
+        factor = ARROW_BYTES_FACTOR if self.passthrough else PANDAS_BYTES_FACTOR
+        return estimate_row_bytes(self.table_name) * factor
+
+    def rows_for(self, bytes_per_row):
+        rows = int(self.budget_mb * CHUNK_SHARE * 1024 ** 2 / max(bytes_per_row, 1))
+        return max(min(rows, MAX_CHUNK_ROWS), MIN_CHUNK_ROWS)
+
+    def initial_chunk_rows(self):
+        """Rows for the first extract chunk"""
+        bytes_per_row = self.bytes_per_row()
+        rows = self.rows_for(bytes_per_row)
+        logger.info(f"Memory budget {self.budget_mb:.0f} MiB for '{self.table_name}': "
+                    f"{rows} rows per chunk at ~{bytes_per_row:.0f} bytes per row")
+        return rows
+
+    def next_chunk_rows(self, rows, frame_bytes):
+        """Rows for the next chunk, given the size and footprint of the last one"""
+        next_rows = self.rows_for(frame_bytes / rows) if rows and frame_bytes else rows
+        rss = current_rss_mb()
+        if rss is not None and rss > self.budget_mb * RSS_HEADROOM:
+            next_rows = max(min(next_rows, rows // 2), MIN_CHUNK_ROWS)
+            logger.warning(f"'{self.table_name}' at {rss:.0f} MiB RSS of a {self.budget_mb:.0f} MiB budget; "
+                           f"next chunk cut to {next_rows} rows")
+        return next_rows
+
+    def max_workers(self, job_mb, requested):
+        """How many jobs of job_mb each fit in the budget, capped at requested (at least one)"""
+        return max(1, min(requested, int(self.budget_mb // max(job_mb, 1))))
+
+def read_key_pages(sql_conn, schema, table_name, sql_columns, key_column, budget, resume_after=None, where=()):
+    """Yield DataFrames of consecutive key ranges (SELECT TOP n ... WHERE key > last), sized by budget.
+
+    where adds SQL Server conditions every page must also match.
+    """
+    column_str = ', '.join([f'[{col}]' for col in sql_columns])
+    rows = budget.initial_chunk_rows()
+    last_key = resume_after
+    while True:
+        query = f"SELECT TOP ({rows}) {column_str} FROM {schema}.[{table_name}]"
+        conditions = list(where)
+        if last_key is not None:
+            conditions.append(f"[{key_column}] > {int(last_key)}")
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += f" ORDER BY [{key_column}]"
+        df = pd.read_sql(query, sql_conn)
+        if df.empty:
+            return
+        fetched = len(df)
+        last_key = df[key_column].iloc[-1]
+        frame_bytes = int(df.memory_usage(deep=True).sum())
+        yield df
+        # Let the caller's copy go before the next page is read
+        del df
+        if fetched < rows:
+            return
+        rows = budget.next_chunk_rows(fetched, frame_bytes)
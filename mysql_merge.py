@@ -0,0 +1,191 @@
+import pandas as pd
+import logging
+import time
+from checkpoint import save_checkpoint
+from batch_sizer import BatchSizer
+from etl_logging import batch_log
+from tracing import traced_sleep
+
+logger = logging.getLogger(__name__)
+
+def to_row_tuples(df):
+    """Convert a DataFrame to a list of tuples with NaN/NaT mapped to None"""
+    clean_df = df.astype(object).where(pd.notna(df), None)
+    return list(clean_df.itertuples(index=False, name=None))
+
+def count_existing_keys(cursor, table_name, key_column, keys):
+    """Count how many of the given keys are already present in the target table"""
+    if not keys:
+        return 0
+    placeholders = ', '.join(['%s'] * len(keys))
+    cursor.execute(f"SELECT COUNT(*) FROM `{table_name}` WHERE `{key_column}` IN ({placeholders})", keys)
+    return cursor.fetchone()[0]
+
+def upsert_data(mysql_conn, table_name, df, mysql_columns, key_column, batch_size=10000, order_by=None, checkpoint=False,
+                sizer=None, verify=True):
+    """Merge data into MySQL table with multi-row INSERT ... ON DUPLICATE KEY UPDATE (verify=False skips the row count)"""
+    try:
+        cursor = mysql_conn.cursor()
+
+        # Disable foreign key checks
+        cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+        mysql_conn.commit()
+
+        # Rename DataFrame columns to match MySQL target columns
+        df.columns = mysql_columns
+
+        # Load in ascending key order to avoid page splits on the clustered index
+        if order_by and not df[order_by].is_monotonic_increasing:
+            df = df.sort_values(order_by, kind='mergesort').reset_index(drop=True)
+
+        column_str = ', '.join([f'`{col}`' for col in mysql_columns])
+        placeholders = ', '.join(['%s'] * len(mysql_columns))
+        update_str = ', '.join([f'`{col}` = VALUES(`{col}`)' for col in mysql_columns if col != key_column])
+        # pymysql rewrites executemany on this statement into multi-row VALUES lists
+        query = (
+            f"INSERT INTO `{table_name}` ({column_str}) VALUES ({placeholders}) "
+            f"ON DUPLICATE KEY UPDATE {update_str}"
+        )
+
+        if sizer is None:
+            sizer = BatchSizer(table_name, batch_size, adaptive=False)
+        total_rows = len(df)
+        total_inserted = 0
+        total_updated = 0
+        total_unchanged = 0
+        start = 0
+        batch_num = 0
+        while start < total_rows:
+            batch_num += 1
+            batch_df = df.iloc[start:start + sizer.size]
+            for attempt in (1, 2):
+                rows = to_row_tuples(batch_df)
+                keys = [row[mysql_columns.index(key_column)] for row in rows]
+                try:
+                    started = time.perf_counter()
+                    existing = count_existing_keys(cursor, table_name, key_column, keys)
+                    cursor.executemany(query, rows)
+                    affected = cursor.rowcount
+                    mysql_conn.commit()
+                    sizer.record(len(rows), time.perf_counter() - started)
+                    break
+                except Exception as e:
+                    mysql_conn.rollback()
+                    if attempt == 2:
+                        logger.error(f"Retry failed for upsert batch {batch_num} in '{table_name}': {str(e)}")
+                        raise
+                    logger.error(f"Error in upsert batch {batch_num} for '{table_name}': {str(e)}")
+                    sizer.record_error()
+                    traced_sleep(5, table=table_name, batch=batch_num)
+                    # Retry with the reduced size; rows past it are picked up by the next batch
+                    batch_df = batch_df.iloc[:sizer.size]
+            start += len(batch_df)
+
+            # MySQL reports 1 affected row per insert, 2 per changed row and 0 per unchanged row
+            inserted = len(rows) - existing
+            updated = max(affected - inserted, 0) // 2
+            total_inserted += inserted
+            total_updated += updated
+            total_unchanged += existing - updated
+            if checkpoint:
+                save_checkpoint(table_name, max(keys), total_inserted + total_updated + total_unchanged)
+            logger.info(
+                "Upserted batch %d: %d rows into '%s' (%d inserted, %d updated)",
+                batch_num, len(rows), table_name, inserted, updated, extra=batch_log(table_name)
+            )
+
+        logger.info(
+            f"Upsert into '{table_name}' complete: {total_inserted} inserted, {total_updated} updated, "
+            f"{total_unchanged} unchanged out of {total_rows} rows"
+        )
+        if verify:
+            cursor.execute(f"SELECT COUNT(*) FROM `{table_name}`")
+            logger.info(f"Total records in target table '{table_name}' after upsert: {cursor.fetchone()[0]}")
+
+        # Re-enable foreign key checks
+        cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+        mysql_conn.commit()
+
+        return {'inserted': total_inserted, 'updated': total_updated, 'unchanged': total_unchanged}
+    except Exception as e:
+        logger.error(f"Failed to upsert data into '{table_name}': {str(e)}")
+        mysql_conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+def merge_via_temp_table(mysql_conn, table_name, df, mysql_columns, key_column, batch_size=10000, strategy='upsert',
+                         sizer=None):
+    """Bulk-load a delta into an unindexed temp table, then merge it into the target in one transaction"""
+    temp_table = f"tmp_merge_{table_name}"
+    try:
+        cursor = mysql_conn.cursor()
+
+        # Disable foreign key checks
+        cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+        mysql_conn.commit()
+
+        # Rename DataFrame columns to match MySQL target columns
+        df.columns = mysql_columns
+        column_str = ', '.join([f'`{col}`' for col in mysql_columns])
+
+        # CREATE ... AS SELECT copies column types but no keys, so the bulk load never maintains an index
+        cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS `{temp_table}`")
+        cursor.execute(f"CREATE TEMPORARY TABLE `{temp_table}` AS SELECT {column_str} FROM `{table_name}` WHERE 1 = 0")
+        placeholders = ', '.join(['%s'] * len(mysql_columns))
+        load_query = f"INSERT INTO `{temp_table}` ({column_str}) VALUES ({placeholders})"
+        if sizer is None:
+            sizer = BatchSizer(table_name, batch_size, adaptive=False)
+        total_rows = len(df)
+        start = 0
+        while start < total_rows:
+            rows = to_row_tuples(df.iloc[start:start + sizer.size])
+            started = time.perf_counter()
+            cursor.executemany(load_query, rows)
+            sizer.record(len(rows), time.perf_counter() - started)
+            start += len(rows)
+        mysql_conn.commit()
+        logger.info(f"Staged {total_rows} rows in temporary table '{temp_table}'")
+
+        # Set-based merge into the real table
+        cursor.execute(f"SELECT COUNT(*) FROM `{temp_table}` s JOIN `{table_name}` t USING (`{key_column}`)")
+        existing = cursor.fetchone()[0]
+        cursor.execute("START TRANSACTION")
+        if strategy == 'delete_insert':
+            cursor.execute(f"DELETE t FROM `{table_name}` t JOIN `{temp_table}` s USING (`{key_column}`)")
+            cursor.execute(
+                f"INSERT INTO `{table_name}` ({column_str}) "
+                f"SELECT {column_str} FROM `{temp_table}` ORDER BY `{key_column}`"
+            )
+            inserted = total_rows - existing
+            updated = existing
+        else:
+            update_str = ', '.join([f'`{col}` = VALUES(`{col}`)' for col in mysql_columns if col != key_column])
+            cursor.execute(
+                f"INSERT INTO `{table_name}` ({column_str}) "
+                f"SELECT {column_str} FROM `{temp_table}` ORDER BY `{key_column}` "
+                f"ON DUPLICATE KEY UPDATE {update_str}"
+            )
+            affected = cursor.rowcount
+            # 1 affected row per insert, 2 per changed row, 0 per unchanged row
+            inserted = total_rows - existing
+            updated = max(affected - inserted, 0) // 2
+        mysql_conn.commit()
+        logger.info(
+            f"Merged '{temp_table}' into '{table_name}' ({strategy}): "
+            f"{inserted} inserted, {updated} updated, {existing - updated} unchanged"
+        )
+
+        cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS `{temp_table}`")
+
+        # Re-enable foreign key checks
+        cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+        mysql_conn.commit()
+
+        return {'inserted': inserted, 'updated': updated, 'unchanged': existing - updated}
+    except Exception as e:
+        logger.error(f"Failed to merge data into '{table_name}': {str(e)}")
+        mysql_conn.rollback()
+        raise
+    finally:
+        cursor.close()
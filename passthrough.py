@@ -0,0 +1,37 @@
+import logging
+from adapters import SqlServerSource, MySqlSink, copy_table
+
+logger = logging.getLogger(__name__)
+
+def load_passthrough(sql_conn, mysql_conn, schema, table_name, sql_columns, mysql_columns, key_column,
+                     mode='truncate', batch_size=10000, fetch_size=50000, resume_after=None, checkpoint=False,
+                     clean_batch=None, cache_key=None, sizer=None, swap=False, where=()):
+    """Copy rows from SQL Server to MySQL without building DataFrames.
+
+    fetchmany tuples go in key order straight to executemany, which the MySQL drivers
+    rewrite into multi-row INSERTs; only a clean_batch step or the extract cache turns
+    them into Arrow record batches. Slice sizes come from sizer, or a fixed batch_size
+    without one. clean_batch, when given, maps each record batch to its cleaned batch.
+    With swap=True the rows go into a shadow table that replaces the target once
+    complete. where limits the extract to the rows matching those SQL Server
+    conditions. Returns the number of rows written.
+    """
+    try:
+        return copy_table(
+            SqlServerSource(sql_conn, schema, cache_key=cache_key, where=where),
+            MySqlSink(mysql_conn),
+            table_name, sql_columns, key_column,
+            target_columns=mysql_columns,
+            mode=mode,
+            resume_after=resume_after,
+            clean_batch=clean_batch,
+            sizer=sizer,
+            batch_size=batch_size,
+            fetch_size=fetch_size,
+            checkpoint=checkpoint and not swap,
+            swap=swap
+        )
+    except Exception as e:
+        logger.error(f"Failed pass-through load of '{table_name}': {str(e)}")
+        mysql_conn.rollback()
+        raise
@@ -0,0 +1,216 @@
+import pandas as pd
+import logging
+import argparse
+from etl_tables import TABLES
+from mysql_merge import upsert_data
+from delete_sync import delete_keys
+from etl_logging import setup_logging
+
+# Configure logging
+setup_logging()
+logger = logging.getLogger(__name__)
+
+# BINARY_CHECKSUM and CRC32 never agree across engines, so both sides hash the same
+# canonical text instead: the first 32 bits of MD5 over '|'-joined column values,
+# with dates, bits, GUIDs and numbers rendered identically on SQL Server and MySQL.
+# Rows with non-ASCII text hash differently (UTF-16/code page vs utf8mb4) and simply
+# show up as divergent, which costs a re-pull but never hides a difference.
+NULL_MARKER = '~'
+
+def get_column_types(mysql_conn, table_name):
+    """Return [(column_name, data_type)] for a MySQL table in ordinal order"""
+    cursor = mysql_conn.cursor()
+    cursor.execute(
+        "SELECT COLUMN_NAME, DATA_TYPE FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s ORDER BY ORDINAL_POSITION",
+        (table_name,)
+    )
+    # mysql-connector may return information_schema text as bytearray
+    columns = [tuple(v.decode() if isinstance(v, (bytes, bytearray)) else v for v in row) for row in cursor.fetchall()]
+    columns = [(col, data_type.lower()) for col, data_type in columns]
+    cursor.close()
+    return columns
+
+def sql_server_column_expr(col, data_type):
+    """Render a column as canonical text on SQL Server"""
+    if data_type in ('datetime', 'timestamp'):
+        # MySQL DATETIME(0) rounds fractional seconds on insert; round the same way instead of truncating
+        expr = f"CONVERT(VARCHAR(19), CAST([{col}] AS DATETIME2(0)), 120)"
+    elif data_type == 'date':
+        expr = f"CONVERT(VARCHAR(10), [{col}], 23)"
+    elif data_type in ('tinyint', 'bit', 'smallint', 'int', 'bigint'):
+        expr = f"CAST(CAST([{col}] AS BIGINT) AS VARCHAR(20))"
+    elif data_type in ('decimal', 'float', 'double'):
+        expr = f"CAST(CAST([{col}] AS DECIMAL(38, 6)) AS VARCHAR(40))"
+    elif data_type == 'char':
+        expr = f"UPPER(CAST([{col}] AS VARCHAR(MAX)))"
+    else:
+        expr = f"CAST([{col}] AS VARCHAR(MAX))"
+    return f"ISNULL({expr}, '{NULL_MARKER}')"
+
+def mysql_column_expr(col, data_type):
+    """Render a column as canonical text on MySQL (for a query run without parameters, so % stays single)"""
+    if data_type in ('datetime', 'timestamp'):
+        expr = f"DATE_FORMAT(`{col}`, '%Y-%m-%d %H:%i:%s')"
+    elif data_type == 'date':
+        expr = f"DATE_FORMAT(`{col}`, '%Y-%m-%d')"
+    elif data_type in ('tinyint', 'bit', 'smallint', 'int', 'bigint'):
+        expr = f"CAST(CAST(`{col}` AS SIGNED) AS CHAR)"
+    elif data_type in ('decimal', 'float', 'double'):
+        expr = f"CAST(CAST(`{col}` AS DECIMAL(38, 6)) AS CHAR)"
+    elif data_type == 'char':
+        expr = f"UPPER(`{col}`)"
+    else:
+        expr = f"CAST(`{col}` AS CHAR)"
+    return f"IFNULL({expr}, '{NULL_MARKER}')"
+
+def sql_server_range_hashes(sql_conn, schema, table_name, key_column, columns, lo, hi, step):
+    """Return {bucket: (row_count, hash_sum)} for [lo, hi] split into buckets of size step"""
+    row_text = ", '|', ".join(sql_server_column_expr(col, data_type) for col, data_type in columns)
+    # Bounds are inlined so the SELECT and GROUP BY bucket expressions are textually identical
+    bucket_expr = f"([{key_column}] - {int(lo)}) / {int(step)}"
+    query = (
+        f"SELECT {bucket_expr} AS bucket, COUNT(*), "
+        f"SUM(CONVERT(BIGINT, CONVERT(BINARY(4), HASHBYTES('MD5', CONCAT({row_text}, ''))))) "
+        f"FROM {schema}.[{table_name}] WHERE [{key_column}] BETWEEN {int(lo)} AND {int(hi)} "
+        f"GROUP BY {bucket_expr}"
+    )
+    cursor = sql_conn.cursor()
+    cursor.execute(query)
+    hashes = {int(row[0]): (int(row[1]), int(row[2])) for row in cursor.fetchall()}
+    cursor.close()
+    return hashes
+
+def mysql_range_hashes(mysql_conn, table_name, key_column, columns, lo, hi, step):
+    """Return {bucket: (row_count, hash_sum)} for [lo, hi] split into buckets of size step"""
+    row_text = ", '|', ".join(mysql_column_expr(col, data_type) for col, data_type in columns)
+    # Bounds are inlined like on SQL Server: pymysql and mysql-connector treat %% differently once params are bound
+    query = (
+        f"SELECT (`{key_column}` - {int(lo)}) DIV {int(step)} AS bucket, COUNT(*), "
+        f"SUM(CAST(CONV(LEFT(MD5(CONCAT({row_text}, '')), 8), 16, 10) AS UNSIGNED)) "
+        f"FROM `{table_name}` WHERE `{key_column}` BETWEEN {int(lo)} AND {int(hi)} "
+        f"GROUP BY bucket"
+    )
+    cursor = mysql_conn.cursor()
+    cursor.execute(query)
+    hashes = {int(row[0]): (int(row[1]), int(row[2])) for row in cursor.fetchall()}
+    cursor.close()
+    return hashes
+
+def get_key_bounds(sql_conn, mysql_conn, schema, table_name, key_column):
+    """Return the (min, max) key across both sides, or None when both tables are empty"""
+    cursor = sql_conn.cursor()
+    cursor.execute(f"SELECT MIN([{key_column}]), MAX([{key_column}]) FROM {schema}.[{table_name}]")
+    source_min, source_max = cursor.fetchone()
+    cursor.close()
+    cursor = mysql_conn.cursor()
+    cursor.execute(f"SELECT MIN(`{key_column}`), MAX(`{key_column}`) FROM `{table_name}`")
+    target_min, target_max = cursor.fetchone()
+    cursor.close()
+    mins = [v for v in (source_min, target_min) if v is not None]
+    maxs = [v for v in (source_max, target_max) if v is not None]
+    if not mins:
+        return None
+    return int(min(mins)), int(max(maxs))
+
+def find_divergent_ranges(sql_conn, mysql_conn, schema, table_name, key_column, fanout=16, min_range_size=2000):
+    """Compare per-range hashes and drill into mismatching ranges until they are small enough to re-pull"""
+    try:
+        bounds = get_key_bounds(sql_conn, mysql_conn, schema, table_name, key_column)
+        if bounds is None:
+            logger.info(f"'{table_name}' is empty on both sides")
+            return []
+        columns = get_column_types(mysql_conn, table_name)
+        pending = [bounds]
+        divergent = []
+        queries = 0
+        while pending:
+            lo, hi = pending.pop()
+            step = max(-(-(hi - lo + 1) // fanout), 1)
+            source = sql_server_range_hashes(sql_conn, schema, table_name, key_column, columns, lo, hi, step)
+            target = mysql_range_hashes(mysql_conn, table_name, key_column, columns, lo, hi, step)
+            queries += 1
+            for bucket in sorted(set(source) | set(target)):
+                if source.get(bucket) == target.get(bucket):
+                    continue
+                bucket_lo = lo + bucket * step
+                bucket_hi = min(bucket_lo + step - 1, hi)
+                if bucket_hi - bucket_lo + 1 <= min_range_size or step == 1:
+                    divergent.append((bucket_lo, bucket_hi))
+                else:
+                    pending.append((bucket_lo, bucket_hi))
+        divergent.sort()
+        divergent_keys = sum(hi - lo + 1 for lo, hi in divergent)
+        logger.info(
+            f"'{table_name}': {len(divergent)} divergent ranges covering {divergent_keys} keys "
+            f"of {bounds[1] - bounds[0] + 1} ({queries} hash rounds)"
+        )
+        return divergent
+    except Exception as e:
+        logger.error(f"Failed to reconcile '{table_name}': {str(e)}")
+        raise
+
+def repair_ranges(sql_conn, mysql_conn, schema, table_name, key_column, ranges):
+    """Re-extract divergent key ranges from SQL Server and rewrite them in MySQL"""
+    try:
+        columns = [col for col, _ in get_column_types(mysql_conn, table_name)]
+        column_str = ', '.join([f'[{col}]' for col in columns])
+        total_rows = 0
+        for lo, hi in ranges:
+            query = (
+                f"SELECT {column_str} FROM {schema}.[{table_name}] "
+                f"WHERE [{key_column}] BETWEEN ? AND ? ORDER BY [{key_column}]"
+            )
+            df = pd.read_sql(query, sql_conn, params=[lo, hi])
+            # Drop target rows in the range that no longer exist at source
+            cursor = mysql_conn.cursor()
+            cursor.execute(
+                f"SELECT `{key_column}` FROM `{table_name}` WHERE `{key_column}` BETWEEN %s AND %s", (lo, hi)
+            )
+            source_keys = set(df[key_column].tolist())
+            stale_keys = [row[0] for row in cursor.fetchall() if row[0] not in source_keys]
+            cursor.close()
+            if stale_keys:
+                delete_keys(mysql_conn, table_name, key_column, stale_keys)
+            if not df.empty:
+                upsert_data(mysql_conn, table_name, df, columns, key_column)
+            total_rows += len(df)
+            logger.info(f"Repaired range [{lo}, {hi}] of '{table_name}': {len(df)} rows re-pulled")
+        logger.info(f"Re-pulled {total_rows} rows across {len(ranges)} ranges of '{table_name}'")
+        return total_rows
+    except Exception as e:
+        logger.error(f"Failed to repair ranges of '{table_name}': {str(e)}")
+        raise
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find (and optionally re-pull) key ranges that differ between SQL Server and MySQL")
+    parser.add_argument('table', choices=sorted(TABLES))
+    parser.add_argument('--fanout', type=int, default=16, help="Sub-ranges per drill-down step")
+    parser.add_argument('--min-range', type=int, default=2000, help="Stop drilling below this many keys")
+    parser.add_argument('--repair', action='store_true', help="Re-extract divergent ranges into MySQL")
+    args = parser.parse_args(argv)
+
+    table_name = args.table
+    key_column = TABLES[table_name]['key']
+    if args.repair and TABLES[table_name]['cleaned']:
+        parser.error(f"{table_name} is cleaned during extraction; rerun {TABLES[table_name]['module']}.py instead of --repair")
+
+    from connections import load_config, open_connections, close_connections
+    ssh_config, sql_server_config, mysql_config = load_config()
+    tunnel = sql_conn = mysql_conn = None
+    try:
+        tunnel, sql_conn, mysql_conn = open_connections(ssh_config, sql_server_config, mysql_config)
+        ranges = find_divergent_ranges(sql_conn, mysql_conn, 'dbo', table_name, key_column,
+                                       fanout=args.fanout, min_range_size=args.min_range)
+        for lo, hi in ranges:
+            logger.info(f"Divergent range: {key_column} {lo}..{hi}")
+        if args.repair and ranges:
+            repair_ranges(sql_conn, mysql_conn, 'dbo', table_name, key_column, ranges)
+    except Exception as e:
+        logger.error(f"Script failed: {str(e)}")
+        raise
+    finally:
+        close_connections(tunnel, sql_conn, mysql_conn)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+import argparse
+import importlib
+import importlib.util
+import logging
+import subprocess
+import sys
+import time
+from etl_tables import TABLES, FLOW_ORDER
+from flow_scheduler import Scheduler, job_seconds, simulate
+from run_metrics import PROFILE_DIR
+from etl_options import parse_memory
+from memory_budget import MemoryBudget
+from etl_logging import setup_logging
+
+# Configure logging
+setup_logging()
+logger = logging.getLogger(__name__)
+
+# How often the parallel runner checks its table processes
+POLL_SECONDS = 1.0
+# Smallest share of --memory-budget worth starting a parallel table job with
+MIN_JOB_BUDGET_MB = 512
+
+def table_argv(table_name, args, forwarded, planned=None):
+    """Command line for one table script; planned arguments come last and win"""
+    argv = list(forwarded)
+    if args.profile:
+        argv.append('--profile')
+    if args.passthrough and TABLES[table_name]['passthrough']:
+        argv.append('--passthrough')
+    if args.job_budget:
+        argv += ['--memory-budget', f"{args.job_budget:.0f}M"]
+    return argv + list(planned or [])
+
+def make_plan(args):
+    """Plan the selected tables against the live source and target"""
+    from run_planner import main as plan_main
+    planner_argv = ['--tables'] + (args.tables or FLOW_ORDER)
+    if args.job_budget:
+        planner_argv += ['--memory-budget', f"{args.job_budget:.0f}M"]
+    return {item['table']: item for item in plan_main(planner_argv)}
+
+def run_table(table_name, argv):
+    """Run one table script's main() in this process; return (succeeded, seconds)"""
+    module = importlib.import_module(TABLES[table_name]['module'])
+    started = time.perf_counter()
+    try:
+        module.main(argv)
+        return True, time.perf_counter() - started
+    except (Exception, SystemExit) as e:
+        logger.error(f"'{table_name}' failed: {str(e)}")
+        return False, time.perf_counter() - started
+
+def run_sequential(tables, args, forwarded, plan):
+    """Run the tables one after another in flow order in this process"""
+    results = []
+    for table_name in tables:
+        planned = plan.get(table_name)
+        logger.info(f"Starting '{table_name}'" + (f" ({planned['strategy']})" if planned else ""))
+        argv = table_argv(table_name, args, forwarded, planned['args'] if planned else None)
+        succeeded, seconds = run_table(table_name, argv)
+        results.append((table_name, succeeded, seconds))
+        if not succeeded and not args.keep_going:
+            # Later tables reference earlier ones; stop rather than load against stale parents
+            break
+    return results
+
+def start_table(table_name, argv):
+    """Run one table script in its own process (own tunnel, connections, profiler and trace)"""
+    script = importlib.util.find_spec(TABLES[table_name]['module']).origin
+    return subprocess.Popen([sys.executable, script] + argv)
+
+def estimate_schedule(tables, plan, workers):
+    """Expected seconds per table and the makespan of running them longest-first on `workers` slots"""
+    durations = {}
+    for table_name in tables:
+        durations[table_name], basis = job_seconds(table_name, plan.get(table_name))
+        logger.info(f"{table_name:<12} expected {durations[table_name]:8.1f}s ({basis})")
+    makespan, timeline = simulate(durations, workers)
+    for table_name, start, finish in sorted(timeline, key=lambda item: item[1]):
+        logger.info(f"{table_name:<12} planned start {start:8.1f}s  finish {finish:8.1f}s")
+    logger.info(f"Expected makespan with {workers} workers: {makespan / 60:.1f} min "
+                f"(one after another: {sum(durations.values()) / 60:.1f} min)")
+    return durations
+
+def run_parallel(tables, args, forwarded, plan):
+    """Run the tables as separate processes on args.workers slots, longest critical path first"""
+    scheduler = Scheduler(estimate_schedule(tables, plan, args.workers), args.workers)
+    origin = time.monotonic()
+    processes = {}
+    results = []
+    while scheduler.has_work():
+        for table_name in scheduler.next_jobs(time.monotonic() - origin):
+            planned = plan.get(table_name)
+            logger.info(f"Starting '{table_name}'" + (f" ({planned['strategy']})" if planned else ""))
+            argv = table_argv(table_name, args, forwarded, planned['args'] if planned else None)
+            processes[table_name] = (start_table(table_name, argv), time.perf_counter())
+        for table_name, (process, started) in list(processes.items()):
+            if process.poll() is None:
+                continue
+            del processes[table_name]
+            scheduler.finish(table_name)
+            succeeded = process.returncode == 0
+            results.append((table_name, succeeded, time.perf_counter() - started))
+            if not succeeded:
+                logger.error(f"'{table_name}' failed with exit code {process.returncode}")
+                if not args.keep_going:
+                    # Let the running loads finish but start nothing that could depend on the failed one
+                    cancelled = scheduler.cancel_pending()
+                    if cancelled:
+                        logger.error(f"Not starting {', '.join(cancelled)}")
+        if scheduler.has_work():
+            time.sleep(POLL_SECONDS)
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run the table loads in flow order (Pronoun -> Calendar -> Identity -> Person -> Enrollment), "
+                    "or with --workers in parallel as their FK parents allow. "
+                    "Options not listed here (--mode, --cache, --resume, ...) are passed to every table script."
+    )
+    parser.add_argument('--tables', nargs='+', choices=FLOW_ORDER, help="Only these tables (still in flow order)")
+    parser.add_argument('--profile', action='store_true',
+                        help=f"cProfile and tracemalloc every stage; .prof files and reports go to {PROFILE_DIR}")
+    parser.add_argument('--passthrough', action='store_true',
+                        help="Use the pandas-free path for the tables that support it")
+    parser.add_argument('--memory-budget', type=parse_memory, metavar='SIZE',
+                        help="Memory available to the run (e.g. 3G), split evenly between --workers; "
+                             "each table job's share is passed to the scripts and the planner")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="Print the cost-based plan (strategies and estimated times) and exit without loading")
+    parser.add_argument('--plan', action='store_true',
+                        help="Plan first, then run each table with its planned strategy (skipping unchanged ones)")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Tables to load at once, each in its own process; jobs start longest-first "
+                             "(by plan estimate or run history) once their FK parents are loaded")
+    parser.add_argument('--keep-going', action='store_true',
+                        help="Continue with later tables after a failure instead of stopping")
+    args, forwarded = parser.parse_known_args(argv)
+
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    # Every worker process gets its own share of the budget, never the whole of it
+    args.job_budget = args.memory_budget
+    if args.memory_budget and args.workers > 1:
+        workers = MemoryBudget('run_flow', args.memory_budget).max_workers(MIN_JOB_BUDGET_MB, args.workers)
+        if workers < args.workers:
+            logger.warning(f"--memory-budget {args.memory_budget:.0f}M fits {workers} jobs of at least "
+                           f"{MIN_JOB_BUDGET_MB} MiB; running {workers} workers instead of {args.workers}")
+            args.workers = workers
+        args.job_budget = args.memory_budget / args.workers
+    plan = make_plan(args) if args.plan or args.dry_run else {}
+    tables = [t for t in FLOW_ORDER if not args.tables or t in args.tables]
+    for table_name, planned in plan.items():
+        if planned['strategy'] == 'skip':
+            logger.info(f"Skipping '{table_name}': {planned['reason']}")
+            tables.remove(table_name)
+    if args.dry_run:
+        if args.workers > 1:
+            estimate_schedule(tables, plan, args.workers)
+        return
+
+    if args.workers > 1:
+        results = run_parallel(tables, args, forwarded, plan)
+    else:
+        results = run_sequential(tables, args, forwarded, plan)
+
+    for table_name, succeeded, seconds in results:
+        logger.info(f"{table_name:<12} {'ok' if succeeded else 'FAILED':<7} {seconds:8.1f}s")
+    if args.profile:
+        logger.info(f"Profiles: {PROFILE_DIR} (open a .prof with snakeviz or python -m pstats)")
+    if not all(succeeded for _, succeeded, _ in results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import statistics
+import sys
+import time
+from etl_state import STATE_DIR
+
+logger = logging.getLogger(__name__)
+
+HISTORY_DB = os.getenv('ETL_HISTORY_DB') or os.path.join(STATE_DIR, 'run_history.sqlite')
+# A run is a regression when its rows/s is this many percent below the trailing median
+REGRESSION_THRESHOLD_PCT = float(os.getenv('ETL_REGRESSION_THRESHOLD_PCT') or 25)
+TRAILING_RUNS = 7
+# Tiny runs are dominated by connection setup and say nothing about throughput
+MIN_ROWS_FOR_TREND = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    table_name TEXT NOT NULL,
+    started REAL NOT NULL,
+    status TEXT NOT NULL,
+    mode TEXT,
+    rows INTEGER NOT NULL,
+    duration_seconds REAL NOT NULL,
+    rows_per_second REAL,
+    load_rows_per_second REAL,
+    batch_rows_median INTEGER,
+    peak_rss_mb REAL,
+    stages TEXT NOT NULL,
+    batch_latency TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_runs_table_started ON runs (table_name, started);
+"""
+
+def connect(path=HISTORY_DB):
+    """Open the run-history database, creating it on first use"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    return conn
+
+def record_run(summary, path=HISTORY_DB):
+    """Append one run summary (as produced by run_metrics) to the history"""
+    duration = summary['duration_seconds']
+    load = summary['stages'].get('load') or {}
+    conn = connect(path)
+    try:
+        with conn:
+            conn.execute(
+                "INSERT INTO runs (table_name, started, status, mode, rows, duration_seconds, rows_per_second, "
+                "load_rows_per_second, batch_rows_median, peak_rss_mb, stages, batch_latency) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    summary['table'], summary['started'], summary['status'], summary['mode'], summary['rows'],
+                    duration, summary['rows'] / duration if duration > 0 else None, load.get('rows_per_second'),
+                    summary['batch_rows_median'], summary['peak_rss_mb'],
+                    json.dumps(summary['stages']), json.dumps(summary['batch_latency_seconds'])
+                )
+            )
+    finally:
+        conn.close()
+
+def trailing_median(conn, table_name, mode, before, runs=TRAILING_RUNS):
+    """Median rows/s of the last `runs` comparable successful runs that started before `before`"""
+    cursor = conn.execute(
+        "SELECT rows_per_second FROM runs WHERE table_name = ? AND mode IS ? AND status = 'success' "
+        "AND rows >= ? AND rows_per_second IS NOT NULL AND started < ? ORDER BY started DESC LIMIT ?",
+        (table_name, mode, MIN_ROWS_FOR_TREND, before, runs)
+    )
+    rates = [row[0] for row in cursor.fetchall()]
+    return statistics.median(rates) if rates else None
+
+def last_stage_bytes_per_row(table_name, stage='extract', passthrough=False, path=HISTORY_DB):
+    """Bytes per row the stage measured in the table's latest successful run of the same path, or None"""
+    if not os.path.exists(path):
+        return None
+    conn = connect(path)
+    try:
+        cursor = conn.execute(
+            "SELECT mode, stages FROM runs WHERE table_name = ? AND status = 'success' ORDER BY started DESC LIMIT 20",
+            (table_name,)
+        )
+        for mode, stages in cursor.fetchall():
+            if (mode or '').endswith('-passthrough') != passthrough:
+                continue
+            measured = json.loads(stages).get(stage) or {}
+            if measured.get('rows') and measured.get('bytes'):
+                return measured['bytes'] / measured['rows']
+    finally:
+        conn.close()
+    return None
+
+def stage_rates(table_name, mode=None, runs=TRAILING_RUNS, path=HISTORY_DB):
+    """Medians over the table's recent successful runs: extract and load rows/s, fixed-cost seconds and duration.
+
+    Runs of `mode` are preferred; without any, every mode counts. Returns None without history.
+    """
+    if not os.path.exists(path):
+        return None
+    conn = connect(path)
+    try:
+        query = ("SELECT stages, duration_seconds FROM runs WHERE table_name = ? AND status = 'success' AND rows >= ? "
+                 "{} ORDER BY started DESC LIMIT ?")
+        rows = conn.execute(query.format("AND mode = ?"), (table_name, MIN_ROWS_FOR_TREND, mode, runs)).fetchall()
+        if not rows:
+            rows = conn.execute(query.format(""), (table_name, MIN_ROWS_FOR_TREND, runs)).fetchall()
+    finally:
+        conn.close()
+    if not rows:
+        return None
+    extract, load, overhead = [], [], []
+    for stages, _ in rows:
+        stages = json.loads(stages)
+        if (stages.get('extract') or {}).get('rows_per_second'):
+            extract.append(stages['extract']['rows_per_second'])
+        if (stages.get('load') or {}).get('rows_per_second'):
+            load.append(stages['load']['rows_per_second'])
+        overhead.append(sum(s['seconds'] for name, s in stages.items() if name not in ('extract', 'transform', 'load')))
+    return {
+        'runs': len(rows),
+        'extract_rows_per_second': statistics.median(extract) if extract else None,
+        'load_rows_per_second': statistics.median(load) if load else None,
+        'overhead_seconds': statistics.median(overhead),
+        'duration_seconds': statistics.median(duration for _, duration in rows),
+    }
+
+def regression_pct(rate, median):
+    """How many percent slower rate is than median (negative when faster)"""
+    return 100.0 * (median - rate) / median
+
+def check_regression(summary, threshold_pct=REGRESSION_THRESHOLD_PCT, path=HISTORY_DB):
+    """Log a warning when a just-finished run is more than threshold_pct slower than its trailing median"""
+    if summary['status'] != 'success' or summary['rows'] < MIN_ROWS_FOR_TREND or summary['duration_seconds'] <= 0:
+        return False
+    conn = connect(path)
+    try:
+        median = trailing_median(conn, summary['table'], summary['mode'], summary['started'])
+    finally:
+        conn.close()
+    if median is None:
+        return False
+    rate = summary['rows'] / summary['duration_seconds']
+    slower = regression_pct(rate, median)
+    if slower > threshold_pct:
+        logger.warning(
+            f"'{summary['table']}' ran at {rate:.0f} rows/s, {slower:.0f}% below its trailing median "
+            f"of {median:.0f} rows/s (mode {summary['mode']})"
+        )
+        return True
+    return False
+
+def report(table_name=None, last=10, threshold_pct=REGRESSION_THRESHOLD_PCT, path=HISTORY_DB, out=sys.stdout):
+    """Print recent runs per table with rows/s against the trailing median; return the number of flagged latest runs"""
+    conn = connect(path)
+    flagged_latest = 0
+    try:
+        tables = [row[0] for row in conn.execute("SELECT DISTINCT table_name FROM runs ORDER BY table_name")]
+        for table in tables:
+            if table_name is not None and table != table_name:
+                continue
+            runs = conn.execute(
+                "SELECT started, status, mode, rows, duration_seconds, rows_per_second, batch_rows_median, peak_rss_mb "
+                "FROM runs WHERE table_name = ? ORDER BY started DESC LIMIT ?",
+                (table, last)
+            ).fetchall()
+            # Benchmark mode labels run long; size the column to the widest one shown
+            mode_width = max([len('mode')] + [len(run[2] or '-') for run in runs])
+            out.write(f"\n{table}\n")
+            out.write(f"  {'started':<19} {'status':<8} {'mode':<{mode_width}} {'rows':>10} {'seconds':>9} "
+                      f"{'rows/s':>9} {'median':>9} {'batch':>7} {'rss MB':>8}\n")
+            for position, (started, status, mode, rows, duration, rate, batch_rows, rss) in enumerate(runs):
+                median = trailing_median(conn, table, mode, started)
+                flag = ''
+                if status == 'success' and rate is not None and median is not None and rows >= MIN_ROWS_FOR_TREND:
+                    slower = regression_pct(rate, median)
+                    if slower > threshold_pct:
+                        flag = f"  SLOW ({slower:.0f}% below median)"
+                        if position == 0:
+                            flagged_latest += 1
+                out.write(
+                    f"  {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(started)):<19} {status:<8} "
+                    f"{mode or '-':<{mode_width}} {rows:>10} {duration:>9.1f} "
+                    f"{rate if rate is not None else 0:>9.0f} {median if median is not None else 0:>9.0f} "
+                    f"{batch_rows or 0:>7} {rss or 0:>8.0f}{flag}\n"
+                )
+    finally:
+        conn.close()
+    return flagged_latest
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect the ETL run history")
+    subcommands = parser.add_subparsers(dest='command', required=True)
+    report_parser = subcommands.add_parser('report', help="Show rows/s trends per table and flag slow runs")
+    report_parser.add_argument('--table', help="Only this table")
+    report_parser.add_argument('--last', type=int, default=10, help="Runs to show per table")
+    report_parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD_PCT,
+                               help="Flag runs this many percent slower than the trailing median")
+    report_parser.add_argument('--fail-on-regression', action='store_true',
+                               help="Exit with status 1 when a table's latest run is flagged")
+    args = parser.parse_args(argv)
+
+    flagged = report(args.table, last=args.last, threshold_pct=args.threshold)
+    if args.fail_on_regression and flagged:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
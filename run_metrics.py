@@ -0,0 +1,261 @@
+import json
+import logging
+import os
+import statistics
+import time
+from contextlib import contextmanager
+from run_history import record_run, check_regression
+from stage_profiler import StageProfiler
+import tracing
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+# One JSON line per table run in runs.jsonl, plus etl_<table>.prom for the node_exporter
+# textfile collector (point --collector.textfile.directory at ETL_METRICS_DIR).
+METRICS_DIR = os.getenv('ETL_METRICS_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'etl_metrics')
+LATENCY_QUANTILES = (0.5, 0.9, 0.99)
+# cProfile + tracemalloc every stage (also --profile); .prof files and reports go to METRICS_DIR/profiles
+PROFILE = (os.getenv('ETL_PROFILE') or '').lower() in ('1', 'true', 'yes')
+PROFILE_DIR = os.path.join(METRICS_DIR, 'profiles')
+# Chrome trace-event JSON per table run (also --trace); open in ui.perfetto.dev or chrome://tracing
+TRACE_DIR = os.path.join(METRICS_DIR, 'traces')
+
+class Stage:
+    """Accumulated time, rows and bytes of one stage of a table run, plus its memory high-water marks"""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.rows = 0
+        self.bytes = 0
+        self.rss_mb = None
+        self.frame_bytes = 0
+
+    def track_frame(self, df):
+        """Note a DataFrame's deep memory footprint; returns it in bytes"""
+        frame_bytes = int(df.memory_usage(deep=True).sum())
+        self.frame_bytes = max(self.frame_bytes, frame_bytes)
+        return frame_bytes
+
+class RunMetrics:
+    """Per-stage timings, row/byte counts and batch latencies for one table run.
+
+    Stages nest: time spent in an inner stage (e.g. extract while a pass-through load
+    pulls its next record batch) is counted there and not in the enclosing stage.
+    """
+
+    def __init__(self, table_name, mode=None, profile=False):
+        self.table_name = table_name
+        self.mode = mode
+        self.profiler = StageProfiler(table_name) if profile else None
+        self.started = time.time()
+        self.status = 'failed'
+        self.stages = {}
+        self.batch_latencies = []
+        self.batch_rows = []
+        self._stack = []
+
+    @contextmanager
+    def stage(self, name):
+        """Time a block as stage `name`; add to .rows/.bytes of the yielded Stage to count work"""
+        stage = self.stages.setdefault(name, Stage())
+        timer = {'started': time.perf_counter(), 'children': 0.0}
+        rows_before, bytes_before = stage.rows, stage.bytes
+        with tracing.span(name, cat='stage', table=self.table_name) as attrs:
+            self._stack.append(timer)
+            try:
+                if self.profiler is None:
+                    yield stage
+                else:
+                    with self.profiler.stage(name):
+                        yield stage
+            finally:
+                self._stack.pop()
+                elapsed = time.perf_counter() - timer['started']
+                stage.seconds += elapsed - timer['children']
+                rss = current_rss_mb()
+                if rss is not None:
+                    stage.rss_mb = max(stage.rss_mb or 0, rss)
+                if self._stack:
+                    self._stack[-1]['children'] += elapsed
+                attrs['rows'] = stage.rows - rows_before
+                attrs['bytes'] = stage.bytes - bytes_before
+
+    def timed_batches(self, name, batches):
+        """Wrap an iterator of record batches so time spent producing them counts as stage `name`"""
+        iterator = iter(batches)
+        while True:
+            with self.stage(name) as stage:
+                batch = next(iterator, None)
+                if batch is not None:
+                    stage.rows += batch.num_rows
+                    stage.bytes += batch.nbytes
+            if batch is None:
+                return
+            yield batch
+
+    def record_batch(self, rows, seconds):
+        """Record the size and latency of one write batch"""
+        self.batch_rows.append(rows)
+        self.batch_latencies.append(seconds)
+        tracing.complete('write_batch', seconds, cat='load', table=self.table_name, rows=rows,
+                         batch=len(self.batch_rows))
+
+    def summary(self):
+        """Return the run as a JSON-serialisable dict"""
+        extract = self.stages.get('extract')
+        bytes_per_row = extract.bytes / extract.rows if extract and extract.rows and extract.bytes else None
+        stages = {}
+        for name, stage in self.stages.items():
+            stage_bytes = stage.bytes or (int(stage.rows * bytes_per_row) if bytes_per_row else 0)
+            stages[name] = {
+                'seconds': round(stage.seconds, 4),
+                'rows': stage.rows,
+                'bytes': stage_bytes,
+                'rows_per_second': round(stage.rows / stage.seconds, 1) if stage.seconds > 0 else None,
+                'bytes_per_second': round(stage_bytes / stage.seconds, 1) if stage.seconds > 0 else None,
+                'rss_mb': stage.rss_mb,
+                'frame_mb': round(stage.frame_bytes / 1024 ** 2, 1) if stage.frame_bytes else None,
+            }
+        latencies = sorted(self.batch_latencies)
+        quantiles = {}
+        for q in LATENCY_QUANTILES:
+            if latencies:
+                quantiles[str(q)] = round(latencies[min(int(q * len(latencies)), len(latencies) - 1)], 4)
+        return {
+            'table': self.table_name,
+            'status': self.status,
+            'mode': self.mode,
+            'started': self.started,
+            'duration_seconds': round(time.time() - self.started, 3),
+            'rows': self.stages['load'].rows if 'load' in self.stages else 0,
+            'stages': stages,
+            'batches': len(latencies),
+            'batch_rows_median': int(statistics.median(self.batch_rows)) if self.batch_rows else None,
+            'batch_latency_seconds': quantiles,
+            'peak_rss_mb': peak_rss_mb(),
+        }
+
+    def write(self):
+        """Append the run to runs.jsonl and rewrite the table's Prometheus textfile"""
+        summary = self.summary()
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        with open(os.path.join(METRICS_DIR, 'runs.jsonl'), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(summary) + '\n')
+        prom_path = os.path.join(METRICS_DIR, f"etl_{self.table_name}.prom")
+        with open(f"{prom_path}.tmp", 'w', encoding='utf-8') as f:
+            f.write(to_prometheus(summary))
+        os.replace(f"{prom_path}.tmp", prom_path)
+        for name, stage in summary['stages'].items():
+            logger.info(
+                f"'{self.table_name}' {name}: {stage['seconds']:.2f}s, {stage['rows']} rows"
+                + (f", {stage['rows_per_second']:.0f} rows/s" if stage['rows_per_second'] else "")
+            )
+        # One line per table that stands in for the per-batch lines the rate limit dropped
+        duration = summary['duration_seconds']
+        logger.info(
+            f"'{self.table_name}' {summary['status']}: {summary['rows']} rows in {duration:.1f}s"
+            + (f" ({summary['rows'] / duration:.0f} rows/s)" if duration > 0 else "")
+            + f", {summary['batches']} batches"
+            + (f" of median {summary['batch_rows_median']} rows, p50 {summary['batch_latency_seconds']['0.5']:.2f}s"
+               if summary['batches'] else "")
+            + (f", peak RSS {summary['peak_rss_mb']:.0f} MiB" if summary['peak_rss_mb'] else "")
+        )
+        return summary
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MiB, where the platform reports it"""
+    if resource is None:
+        return None
+    # ru_maxrss is KiB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+def current_rss_mb():
+    """Current resident set size of this process in MiB, or None where it cannot be read"""
+    if psutil is not None:
+        return round(psutil.Process().memory_info().rss / 1024 ** 2, 1)
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return round(int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2, 1)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def to_prometheus(summary):
+    """Render a run summary in the Prometheus text exposition format"""
+    table = summary['table']
+    lines = []
+
+    def metric(name, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        for labels, value in samples:
+            if value is None:
+                continue
+            label_str = ','.join(f'{k}="{v}"' for k, v in [('table', table)] + labels)
+            lines.append(f"{name}{{{label_str}}} {value}")
+
+    stages = summary['stages'].items()
+    metric('etl_stage_seconds', "Time spent in each stage of the last run",
+           [([('stage', name)], s['seconds']) for name, s in stages])
+    metric('etl_stage_rows', "Rows handled by each stage of the last run",
+           [([('stage', name)], s['rows']) for name, s in stages])
+    metric('etl_stage_rows_per_second', "Row throughput of each stage of the last run",
+           [([('stage', name)], s['rows_per_second']) for name, s in stages])
+    metric('etl_stage_bytes_per_second', "Byte throughput of each stage of the last run",
+           [([('stage', name)], s['bytes_per_second']) for name, s in stages])
+    metric('etl_stage_rss_mb', "Highest resident set size at the end of each stage of the last run",
+           [([('stage', name)], s.get('rss_mb')) for name, s in stages])
+    metric('etl_stage_frame_mb', "Largest pandas DataFrame footprint held by each stage of the last run",
+           [([('stage', name)], s.get('frame_mb')) for name, s in stages])
+    metric('etl_batch_latency_seconds', "Write batch latency quantiles of the last run",
+           [([('quantile', q)], v) for q, v in summary['batch_latency_seconds'].items()])
+    metric('etl_run_duration_seconds', "Wall time of the last run", [([], summary['duration_seconds'])])
+    metric('etl_run_success', "1 if the last run succeeded or was skipped as unchanged",
+           [([], 1 if summary['status'] in ('success', 'skipped') else 0)])
+    metric('etl_run_timestamp_seconds', "Start time of the last run", [([], summary['started'])])
+    return '\n'.join(lines) + '\n'
+
+_active = {}
+
+def start_run(table_name, mode=None, profile=False, trace=False):
+    """Begin collecting metrics for a table run.
+
+    profile (or ETL_PROFILE) profiles its stages; trace (or ETL_TRACE) records its spans.
+    """
+    if trace or tracing.TRACE:
+        tracing.enable()
+    metrics = RunMetrics(table_name, mode=mode, profile=profile or PROFILE)
+    _active[table_name] = metrics
+    return metrics
+
+def for_table(table_name):
+    """Return the metrics of the table's active run, or a throwaway collector outside of one"""
+    return _active.get(table_name) or RunMetrics(table_name)
+
+def finish_run(table_name):
+    """Write the table's metrics, add the run to the history store and end the run"""
+    metrics = _active.pop(table_name, None)
+    if metrics is None:
+        return None
+    try:
+        summary = metrics.write()
+        if metrics.profiler is not None:
+            metrics.profiler.write(PROFILE_DIR)
+        if tracing.enabled():
+            started = time.strftime('%Y%m%d_%H%M%S', time.localtime(metrics.started))
+            trace_path = os.path.join(TRACE_DIR, f"{table_name}_{started}.json")
+            spans = tracing.write_trace(trace_path)
+            logger.info(f"Wrote {spans} trace spans for '{table_name}' to {trace_path}")
+        record_run(summary)
+        check_regression(summary)
+        return summary
+    except Exception as e:
+        logger.warning(f"Failed to write metrics for '{table_name}': {str(e)}")
+        return None
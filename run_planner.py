@@ -0,0 +1,200 @@
+import argparse
+import datetime
+import json
+import logging
+import os
+import sys
+from connections import load_config, open_connections, close_connections
+from ddl_schema import parse_columns
+from etl_options import parse_memory
+from etl_tables import TABLES, FLOW_ORDER
+from run_history import stage_rates
+from etl_logging import setup_logging
+
+# Configure logging
+setup_logging()
+logger = logging.getLogger(__name__)
+
+# Rates assumed for a table without run history (rows/s through the tunnel and into RDS)
+DEFAULT_EXTRACT_ROWS_PER_SECOND = float(os.getenv('ETL_PLAN_EXTRACT_ROWS_PER_SECOND') or 20000)
+DEFAULT_LOAD_ROWS_PER_SECOND = float(os.getenv('ETL_PLAN_LOAD_ROWS_PER_SECOND') or 5000)
+DEFAULT_OVERHEAD_SECONDS = 15.0
+# Upsert the changed rows when at most this share of the target changed; reload otherwise
+INCREMENTAL_MAX_FRACTION = 0.2
+# Extracts larger than this share of the memory budget are read in key-range partitions
+PARTITION_BUDGET_SHARE = 0.25
+DEFAULT_MEMORY_BUDGET = '3G'
+
+def source_stats(sql_conn, schema, table_name):
+    """Row count and in-row bytes of a SQL Server table from sys.dm_db_partition_stats (COUNT_BIG fallback)"""
+    cursor = sql_conn.cursor()
+    try:
+        cursor.execute(
+            "SELECT SUM(ps.row_count), SUM(ps.used_page_count) * 8192 "
+            "FROM sys.dm_db_partition_stats ps "
+            "JOIN sys.objects o ON o.object_id = ps.object_id "
+            "JOIN sys.schemas s ON s.schema_id = o.schema_id "
+            "WHERE s.name = ? AND o.name = ? AND ps.index_id IN (0, 1)",
+            schema, table_name
+        )
+        row_count, used_bytes = cursor.fetchone()
+        if row_count is not None:
+            return int(row_count), int(used_bytes or 0)
+    except Exception as e:
+        # The DMV needs VIEW DATABASE STATE
+        logger.warning(f"No partition stats for {schema}.{table_name} ({str(e)}); counting rows instead")
+    finally:
+        cursor.close()
+    cursor = sql_conn.cursor()
+    try:
+        cursor.execute(f"SELECT COUNT_BIG(*) FROM {schema}.[{table_name}]")
+        return int(cursor.fetchone()[0]), None
+    finally:
+        cursor.close()
+
+def target_stats(mysql_conn, table_name, watermark_column=None):
+    """Exact row count, on-disk bytes and MAX(watermark_column) of a MySQL table"""
+    cursor = mysql_conn.cursor()
+    try:
+        cursor.execute(
+            "SELECT DATA_LENGTH + INDEX_LENGTH FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+            (table_name,)
+        )
+        row = cursor.fetchone()
+        table_bytes = int(row[0]) if row and row[0] is not None else None
+        select = f"COUNT(*), MAX(`{watermark_column}`)" if watermark_column else "COUNT(*), NULL"
+        cursor.execute(f"SELECT {select} FROM `{table_name}`")
+        row_count, watermark = cursor.fetchone()
+        return int(row_count), table_bytes, watermark
+    finally:
+        cursor.close()
+
+def changed_rows(sql_conn, schema, table_name, watermark_column, watermark):
+    """Source rows modified after the target's newest row"""
+    # The target's DATETIME(0) rounded source values to whole seconds on load, so a source row is newer
+    # than the watermark only from half a second past it. Shifting the parameter instead of rounding the
+    # column keeps the comparison sargable on the IX_*_modifiedDate indexes.
+    cursor = sql_conn.cursor()
+    try:
+        cursor.execute(
+            f"SELECT COUNT_BIG(*) FROM {schema}.[{table_name}] WHERE [{watermark_column}] >= ?",
+            watermark + datetime.timedelta(milliseconds=500)
+        )
+        return int(cursor.fetchone()[0])
+    finally:
+        cursor.close()
+
+def choose_strategy(table_name, source_rows, source_bytes, target_rows, changed, budget_mb, watermark=None):
+    """Return (strategy, table script arguments, reason)"""
+    passthrough = TABLES[table_name]['passthrough']
+    if changed == 0 and source_rows == target_rows:
+        return 'skip', [], "no rows modified since the target's newest row and row counts match"
+    if changed is not None and target_rows and changed <= INCREMENTAL_MAX_FRACTION * target_rows:
+        # The watermark was rounded to the second on load; start half a second earlier so no row of that
+        # second is missed (re-upserting the few already loaded is harmless)
+        since = watermark - datetime.timedelta(milliseconds=500)
+        args = ['--mode', 'upsert', '--since', since.isoformat(), '--propagate-deletes']
+        args += ['--passthrough'] if passthrough else []
+        return 'incremental', args, f"{changed} changed rows ({100.0 * changed / target_rows:.1f}% of target)"
+    if not passthrough or (source_bytes and source_bytes > budget_mb * 1024 ** 2 * PARTITION_BUDGET_SHARE):
+        size = f"{source_bytes / 1024 ** 2:.0f} MiB" if source_bytes else "unknown size"
+        args = ['--memory-budget', f"{budget_mb:.0f}M"]
+        if passthrough:
+            # Only Enrollment reads keyset pages; the pass-through tables stay within the budget by streaming
+            # budget-sized fetches instead
+            return 'partitioned', ['--passthrough'] + args, f"{size} extract streamed in budget-sized fetches"
+        return 'partitioned', args, f"{size} extract read in budget-sized key ranges"
+    return 'full-with-swap', ['--swap'], "full reload into a shadow table swapped in at the end"
+
+def run_mode(args):
+    """The mode label the table script records in the run history for these arguments"""
+    mode = args[args.index('--mode') + 1] if '--mode' in args else 'truncate'
+    # --swap implies --passthrough
+    return f"{mode}-passthrough" if '--passthrough' in args or '--swap' in args else mode
+
+def estimate(table_name, strategy, args, rows):
+    """Estimated (extract, load, overhead) seconds for moving rows with args, and what they are based on"""
+    if strategy == 'skip':
+        return 0.0, 0.0, 0.0, 'skipped'
+    mode = run_mode(args)
+    rates = stage_rates(table_name, mode=mode)
+    extract_rate = (rates or {}).get('extract_rows_per_second') or DEFAULT_EXTRACT_ROWS_PER_SECOND
+    load_rate = (rates or {}).get('load_rows_per_second') or DEFAULT_LOAD_ROWS_PER_SECOND
+    overhead = rates['overhead_seconds'] if rates else DEFAULT_OVERHEAD_SECONDS
+    # Overhead from the history includes the delete sync's key comparison
+    basis = f"median of {rates['runs']} runs" if rates else "default rates"
+    return rows / extract_rate, rows / load_rate, overhead, basis
+
+def build_plan(sql_conn, mysql_conn, tables=None, budget_mb=None, schema='dbo'):
+    """Plan each table of the flow: sizes, changed rows, strategy, arguments and estimated seconds"""
+    budget_mb = budget_mb or parse_memory(DEFAULT_MEMORY_BUDGET)
+    plan = []
+    for table_name in tables or FLOW_ORDER:
+        columns = [c['name'] for c in parse_columns(table_name)]
+        watermark_column = 'modifiedDate' if 'modifiedDate' in columns else None
+        source_rows, source_bytes = source_stats(sql_conn, schema, table_name)
+        target_rows, target_bytes, watermark = target_stats(mysql_conn, table_name, watermark_column)
+        changed = None
+        if watermark_column and watermark is not None:
+            changed = changed_rows(sql_conn, schema, table_name, watermark_column, watermark)
+        strategy, args, reason = choose_strategy(table_name, source_rows, source_bytes, target_rows, changed, budget_mb,
+                                                 watermark)
+        # An incremental load extracts only the changed rows
+        rows = changed if strategy == 'incremental' else source_rows
+        extract_seconds, load_seconds, overhead_seconds, basis = estimate(table_name, strategy, args, rows)
+        plan.append({
+            'table': table_name,
+            'source_rows': source_rows,
+            'source_bytes': source_bytes,
+            'avg_row_bytes': round(source_bytes / source_rows) if source_bytes and source_rows else None,
+            'target_rows': target_rows,
+            'target_bytes': target_bytes,
+            'changed_rows': changed,
+            'strategy': strategy,
+            'args': args,
+            'reason': reason,
+            'extract_seconds': round(extract_seconds, 1),
+            'load_seconds': round(load_seconds, 1),
+            'overhead_seconds': round(overhead_seconds, 1),
+            'seconds': round(extract_seconds + load_seconds + overhead_seconds, 1),
+            'basis': basis,
+        })
+    return plan
+
+def print_plan(plan, out=sys.stdout):
+    """Print the plan and its expected wall time when the tables run one after another"""
+    out.write(f"{'table':<12} {'src rows':>11} {'row B':>6} {'tgt rows':>11} {'changed':>9} {'strategy':<15} "
+              f"{'extract':>8} {'load':>8} {'total':>8}  arguments / basis\n")
+    for item in plan:
+        changed = item['changed_rows'] if item['changed_rows'] is not None else '?'
+        out.write(
+            f"{item['table']:<12} {item['source_rows']:>11} {item['avg_row_bytes'] or '?':>6} {item['target_rows']:>11} "
+            f"{changed:>9} {item['strategy']:<15} {item['extract_seconds']:>7.0f}s {item['load_seconds']:>7.0f}s "
+            f"{item['seconds']:>7.0f}s  {' '.join(item['args']) or '-'} ({item['basis']}; {item['reason']})\n"
+        )
+    total = sum(item['seconds'] for item in plan)
+    out.write(f"\nExpected wall time in flow order: {total / 60:.1f} min\n")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Estimate and plan a run without loading anything")
+    parser.add_argument('--tables', nargs='+', choices=FLOW_ORDER, help="Only these tables")
+    parser.add_argument('--memory-budget', type=parse_memory, default=parse_memory(DEFAULT_MEMORY_BUDGET),
+                        metavar='SIZE', help="Worker memory available to one table job (default 3G)")
+    parser.add_argument('--json', metavar='PATH', help="Also write the plan as JSON")
+    args = parser.parse_args(argv)
+
+    ssh_config, sql_server_config, mysql_config = load_config()
+    tunnel, sql_conn, mysql_conn = open_connections(ssh_config, sql_server_config, mysql_config)
+    try:
+        plan = build_plan(sql_conn, mysql_conn, args.tables, args.memory_budget)
+    finally:
+        close_connections(tunnel, sql_conn, mysql_conn)
+    print_plan(plan)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(plan, f, indent=2, default=str)
+    return plan
+
+if __name__ == "__main__":
+    main()
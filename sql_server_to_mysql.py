@@ -4,10 +4,13 @@ import pyodbc
 import sshtunnel
 from sqlalchemy import create_engine
 import logging
+import time
 import urllib.parse
+from batch_sizer import BatchSizer
+from etl_logging import setup_logging
 
 # Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+setup_logging()
 logger = logging.getLogger(__name__)
 
 def create_ssh_tunnel(ssh_host, ssh_username, ssh_password, ssh_private_key_path, remote_host, remote_port):
@@ -200,16 +203,24 @@ def transfer_data(sql_conn, mysql_conn, mysql_config, table_name):
         create_table_in_mysql(mysql_conn, table_name, columns_info)
         # Read data from SQL Server with chunking
         query = f"SELECT * FROM dbo.{table_name}"
-        chunk_size = 10000  # Adjust based on memory constraints
+        chunk_size = 50000  # Rows read per chunk; write batches are sized by BatchSizer
         # Create SQLAlchemy engine for MySQL with URL-encoded password
         encoded_password = urllib.parse.quote(mysql_config['password'])
         mysql_engine = create_engine(
             f"mysql+pymysql://{mysql_config['user']}:{encoded_password}@{mysql_config['host']}/{mysql_config['database']}"
         )
         # Transfer data in chunks
+        sizer = BatchSizer.for_table(table_name)
         for chunk in pd.read_sql(query, sql_conn, chunksize=chunk_size):
-            chunk.to_sql(table_name, mysql_engine, if_exists='append', index=False)
+            start = 0
+            while start < len(chunk):
+                batch = chunk.iloc[start:start + sizer.size]
+                started = time.perf_counter()
+                batch.to_sql(table_name, mysql_engine, if_exists='append', index=False)
+                sizer.record(len(batch), time.perf_counter() - started)
+                start += len(batch)
             logger.info(f"Transferred {len(chunk)} rows to {table_name}")
+        sizer.save()
     except Exception as e:
         logger.error(f"Failed to transfer data for table {table_name}: {str(e)}")
         raise
@@ -0,0 +1,106 @@
+import cProfile
+import io
+import logging
+import os
+import pstats
+import tracemalloc
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+TOP_FUNCTIONS = 30
+TOP_ALLOCATIONS = 25
+# Snapshot a stage's allocations again only when its peak grows by this factor; extract
+# and load stages run once per batch and a snapshot of every one would dominate the run
+SNAPSHOT_GROWTH = 1.1
+TRACEMALLOC_FRAMES = 10
+
+class StageProfiler:
+    """cProfile and tracemalloc per stage of one table run.
+
+    Each stage gets its own profiler; while an inner stage runs, the enclosing stage's
+    profiler is paused so time lands in exactly one of them, as with RunMetrics timings.
+    tracemalloc tracks the peak traced memory of every stage and keeps the allocation
+    snapshot taken at the end of its largest occurrence.
+    """
+
+    def __init__(self, table_name, top_functions=TOP_FUNCTIONS, top_allocations=TOP_ALLOCATIONS):
+        self.table_name = table_name
+        self.top_functions = top_functions
+        self.top_allocations = top_allocations
+        self.profiles = {}
+        self.peaks = {}
+        self.snapshots = {}
+        self._stack = []
+        self._started_tracemalloc = not tracemalloc.is_tracing()
+        if self._started_tracemalloc:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+
+    @contextmanager
+    def stage(self, name):
+        profile = self.profiles.setdefault(name, cProfile.Profile())
+        if self._stack:
+            parent = self._stack[-1]
+            self.profiles[parent].disable()
+            self._note_peak(parent)
+        self._stack.append(name)
+        tracemalloc.reset_peak()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            self._stack.pop()
+            peak = self._note_peak(name)
+            if peak > self.snapshots.get(name, (0, None))[0] * SNAPSHOT_GROWTH:
+                self.snapshots[name] = (peak, tracemalloc.take_snapshot())
+            if self._stack:
+                tracemalloc.reset_peak()
+                self.profiles[self._stack[-1]].enable()
+
+    def _note_peak(self, name):
+        _, peak = tracemalloc.get_traced_memory()
+        self.peaks[name] = max(self.peaks.get(name, 0), peak)
+        return peak
+
+    def write(self, directory):
+        """Write <table>.prof, one <table>_<stage>.prof per stage and <table>_profile.txt; return the paths"""
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        profiled = {name: profile for name, profile in self.profiles.items() if profile.getstats()}
+        for name, profile in profiled.items():
+            path = os.path.join(directory, f"{self.table_name}_{name}.prof")
+            profile.dump_stats(path)
+            paths.append(path)
+        if profiled:
+            combined = pstats.Stats(*profiled.values())
+            path = os.path.join(directory, f"{self.table_name}.prof")
+            combined.dump_stats(path)
+            paths.append(path)
+        path = os.path.join(directory, f"{self.table_name}_profile.txt")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.report())
+        paths.append(path)
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+        logger.info(f"Wrote profiles for '{self.table_name}' to {directory}")
+        return paths
+
+    def report(self):
+        """Text report: top functions by cumulative time and top allocation sites per stage"""
+        out = io.StringIO()
+        for name, profile in self.profiles.items():
+            if not profile.getstats():
+                continue
+            out.write(f"=== {self.table_name} {name}: peak traced memory {self.peaks.get(name, 0) / 1024 ** 2:.1f} MiB\n")
+            stats = pstats.Stats(profile, stream=out)
+            stats.sort_stats('cumulative').print_stats(self.top_functions)
+            if name in self.snapshots:
+                _, snapshot = self.snapshots[name]
+                snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+                out.write(f"Top {self.top_allocations} live allocations at the end of the largest '{name}':\n")
+                for stat in snapshot.statistics('lineno')[:self.top_allocations]:
+                    frame = stat.traceback[0]
+                    out.write(f"  {stat.size / 1024 ** 2:9.2f} MiB {stat.count:>9} blocks  {frame.filename}:{frame.lineno}\n")
+            out.write("\n")
+        return out.getvalue()
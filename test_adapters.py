@@ -0,0 +1,62 @@
+import sqlite3
+import pytest
+import etl_state
+from adapters import Sink, SqliteSink, SqliteSource, Source, copy_table
+from checkpoint import get_resume_key
+
+@pytest.fixture(autouse=True)
+def state_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(etl_state, 'STATE_DIR', str(tmp_path))
+
+@pytest.fixture
+def source_path(tmp_path):
+    path = str(tmp_path / 'source.db')
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE Pronoun (pronounID INTEGER, name TEXT)")
+    conn.executemany("INSERT INTO Pronoun VALUES (?, ?)", [(k, f"pronoun {k}") for k in range(1, 2501)])
+    conn.commit()
+    conn.close()
+    return path
+
+class RecordingSink(SqliteSink):
+    def __init__(self, path):
+        super().__init__(path)
+        self.batch_types = set()
+
+    def _write(self, table_name, columns, batch, key_column, mode):
+        self.batch_types.add(type(batch).__name__)
+        super()._write(table_name, columns, batch, key_column, mode)
+
+def copy(source_path, sink, **kwargs):
+    return copy_table(SqliteSource(source_path), sink, 'Pronoun', ['pronounID', 'name'], 'pronounID',
+                      batch_size=1000, fetch_size=700, **kwargs)
+
+def test_uncleaned_copy_writes_fetchmany_tuples(source_path, tmp_path):
+    sink = RecordingSink(str(tmp_path / 'target.db'))
+    assert copy(source_path, sink, checkpoint=True) == 2500
+    assert sink.batch_types == {'RowBatch'}
+    assert sink.conn.execute("SELECT COUNT(*), MAX(pronounID) FROM Pronoun").fetchone() == (2500, 2500)
+    assert get_resume_key('Pronoun') == 2500
+
+def test_cleaning_step_gets_record_batches(source_path, tmp_path):
+    sink = RecordingSink(str(tmp_path / 'target.db'))
+    cleaned = []
+    def clean_batch(batch):
+        cleaned.append(batch.num_rows)
+        return batch
+    assert copy(source_path, sink, clean_batch=clean_batch) == 2500
+    assert sink.batch_types == {'RecordBatch'}
+    assert sum(cleaned) == 2500
+
+def test_resumed_upsert_copies_the_tail(source_path, tmp_path):
+    sink = RecordingSink(str(tmp_path / 'target.db'))
+    assert copy(source_path, sink, mode='upsert', resume_after=2400) == 100
+
+def test_incomplete_adapters_fail_when_created():
+    class Partial(Sink):
+        def truncate(self, table_name):
+            pass
+    with pytest.raises(TypeError):
+        Partial()
+    with pytest.raises(TypeError):
+        Source()
@@ -0,0 +1,64 @@
+import pytest
+import etl_state
+from batch_sizer import BATCH_BYTE_BUDGET, BatchSizer, estimate_row_bytes
+
+@pytest.fixture(autouse=True)
+def state_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(etl_state, 'STATE_DIR', str(tmp_path))
+
+def sizer(initial_size=1000, **kwargs):
+    # A table without DDL has no byte estimate, so only min/max bound the size
+    return BatchSizer('NoSuchTable', initial_size=initial_size, **kwargs)
+
+def test_growth_is_capped_at_double():
+    batch = sizer()
+    batch.record(1000, 0.01)
+    assert batch.size == 2000
+
+def test_shrink_is_capped_at_half():
+    batch = sizer()
+    batch.record(1000, 100.0)
+    assert batch.size == 500
+
+def test_converges_on_target_latency():
+    batch = sizer(target_seconds=2.0)
+    for _ in range(20):
+        batch.record(batch.size, batch.size / 5000)
+    assert batch.size == 10000
+
+def test_stays_within_min_and_max():
+    batch = sizer(min_size=200, max_size=3000)
+    for _ in range(5):
+        batch.record(batch.size, 0.001)
+    assert batch.size == 3000
+    batch = sizer(min_size=200, max_size=3000)
+    for _ in range(5):
+        batch.record(batch.size, 1000.0)
+    assert batch.size == 200
+
+def test_ignores_empty_and_fixed_batches():
+    batch = sizer()
+    batch.record(0, 1.0)
+    batch.record(1000, 0.0)
+    assert batch.size == 1000
+    fixed = sizer(adaptive=False)
+    fixed.record(1000, 0.01)
+    assert fixed.size == 1000
+
+def test_record_error_halves_size():
+    batch = sizer()
+    batch.record_error()
+    assert batch.size == 500
+
+def test_adaptive_size_is_capped_by_byte_budget():
+    cap = BATCH_BYTE_BUDGET // estimate_row_bytes('Enrollment')
+    batch = BatchSizer('Enrollment', initial_size=cap // 2)
+    for _ in range(10):
+        batch.record(batch.size, 0.001)
+    assert batch.max_size == cap
+    assert batch.size == cap
+
+def test_saved_size_seeds_next_run():
+    batch = BatchSizer('Enrollment', initial_size=700)
+    batch.save()
+    assert BatchSizer('Enrollment').size == 700
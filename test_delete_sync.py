@@ -0,0 +1,16 @@
+from delete_sync import sorted_anti_join
+
+def test_returns_target_keys_missing_from_source():
+    assert sorted_anti_join([1, 2, 4, 7], [1, 2, 3, 4, 5, 7, 9]) == [3, 5, 9]
+
+def test_source_keys_absent_from_target_are_ignored():
+    assert sorted_anti_join([1, 2, 3, 10, 11], [2, 3]) == []
+
+def test_empty_sides():
+    assert sorted_anti_join([], [1, 2]) == [1, 2]
+    assert sorted_anti_join([1, 2], []) == []
+
+def test_consumes_generators_once():
+    source = (k for k in range(0, 100, 2))
+    target = (k for k in range(100))
+    assert sorted_anti_join(source, target) == list(range(1, 100, 2))
@@ -0,0 +1,48 @@
+from etl_tables import TABLES
+from flow_scheduler import Scheduler, critical_path, simulate
+
+DURATIONS = {'Pronoun': 5, 'Calendar': 60, 'Identity': 600, 'Person': 400, 'Enrollment': 900}
+
+def test_critical_path_adds_longest_waiting_chain():
+    after = {t: TABLES[t]['after'] for t in DURATIONS}
+    rank = critical_path(DURATIONS, after)
+    assert rank['Enrollment'] == 900
+    assert rank['Person'] == 1300
+    assert rank['Identity'] == 1900
+    assert rank['Pronoun'] == 1905
+    assert rank['Calendar'] == 960
+
+def test_single_worker_runs_everything_back_to_back():
+    makespan, timeline = simulate(DURATIONS, 1)
+    assert makespan == sum(DURATIONS.values())
+    assert [t for t, _, _ in timeline] == ['Pronoun', 'Identity', 'Person', 'Calendar', 'Enrollment']
+
+def test_two_workers_finish_on_the_critical_path():
+    makespan, timeline = simulate(DURATIONS, 2)
+    assert makespan == 1905
+    starts = {t: start for t, start, _ in timeline}
+    # Calendar's slot is not taken before Pronoun has finished
+    assert starts['Calendar'] == 5
+    assert starts['Enrollment'] == 1005
+
+def test_parents_finish_before_children_start():
+    for workers in (1, 2, 3):
+        _, timeline = simulate(DURATIONS, workers)
+        finished = {t: end for t, _, end in timeline}
+        for table_name, start, _ in timeline:
+            for parent in TABLES[table_name]['after']:
+                assert finished[parent] <= start
+
+def test_parents_outside_the_run_are_treated_as_loaded():
+    scheduler = Scheduler({'Enrollment': 900}, 2)
+    assert scheduler.next_jobs(0.0) == ['Enrollment']
+
+def test_cancel_pending_keeps_running_jobs():
+    scheduler = Scheduler(DURATIONS, 2)
+    started = scheduler.next_jobs(0.0)
+    cancelled = scheduler.cancel_pending()
+    assert set(started) | set(cancelled) == set(DURATIONS)
+    assert scheduler.has_work()
+    for table_name in started:
+        scheduler.finish(table_name)
+    assert not scheduler.has_work()
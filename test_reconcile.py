@@ -0,0 +1,71 @@
+import pytest
+
+pytest.importorskip('pandas')
+import reconcile
+
+def bucket_hashes(rows, lo, hi, step):
+    hashes = {}
+    for key, value in rows.items():
+        if lo <= key <= hi:
+            count, total = hashes.get((key - lo) // step, (0, 0))
+            hashes[(key - lo) // step] = (count + 1, total + hash(value))
+    return hashes
+
+@pytest.fixture
+def queries(monkeypatch):
+    """Stand the two sides in with {key: row} dicts; count hash rounds per side"""
+    calls = []
+    def source_hashes(sql_conn, schema, table_name, key_column, columns, lo, hi, step):
+        calls.append((lo, hi, step))
+        return bucket_hashes(sql_conn, lo, hi, step)
+    def target_hashes(mysql_conn, table_name, key_column, columns, lo, hi, step):
+        return bucket_hashes(mysql_conn, lo, hi, step)
+    def key_bounds(sql_conn, mysql_conn, schema, table_name, key_column):
+        keys = list(sql_conn) + list(mysql_conn)
+        return (min(keys), max(keys)) if keys else None
+    monkeypatch.setattr(reconcile, 'sql_server_range_hashes', source_hashes)
+    monkeypatch.setattr(reconcile, 'mysql_range_hashes', target_hashes)
+    monkeypatch.setattr(reconcile, 'get_key_bounds', key_bounds)
+    monkeypatch.setattr(reconcile, 'get_column_types', lambda mysql_conn, table_name: [])
+    return calls
+
+def divergent(source, target, **kwargs):
+    return reconcile.find_divergent_ranges(source, target, 'dbo', 'Person', 'personID', **kwargs)
+
+def test_identical_sides_need_one_round(queries):
+    rows = {k: f"row {k}" for k in range(1, 10001)}
+    assert divergent(rows, dict(rows)) == []
+    assert len(queries) == 1
+
+def test_drills_down_to_the_changed_key(queries):
+    source = {k: f"row {k}" for k in range(1, 100001)}
+    target = {**source, 54321: 'stale'}
+    ranges = divergent(source, target, fanout=16, min_range_size=100)
+    assert len(ranges) == 1
+    lo, hi = ranges[0]
+    assert lo <= 54321 <= hi
+    assert hi - lo + 1 <= 100
+
+def test_ranges_cover_missing_and_extra_keys(queries):
+    source = {k: f"row {k}" for k in range(1, 5001)}
+    target = dict(source)
+    del target[17]
+    target[5003] = 'orphan'
+    ranges = divergent(source, target, fanout=4, min_range_size=10)
+    for key in (17, 5003):
+        assert any(lo <= key <= hi for lo, hi in ranges)
+    assert ranges == sorted(ranges)
+
+def test_last_bucket_stops_at_upper_bound(queries):
+    source = {k: 'a' for k in range(0, 10)}
+    target = {**source, 9: 'b'}
+    assert divergent(source, target, fanout=3, min_range_size=5) == [(8, 9)]
+
+def test_step_one_stops_the_drill_down(queries):
+    source = {k: 'a' for k in range(0, 8)}
+    target = {**source, 5: 'b'}
+    assert divergent(source, target, fanout=2, min_range_size=0) == [(5, 5)]
+
+def test_empty_tables(queries):
+    assert divergent({}, {}) == []
+    assert queries == []
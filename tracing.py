@@ -0,0 +1,85 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Spans are collected in memory only while tracing is enabled (--trace or ETL_TRACE=1) and
+# written as Chrome trace-event JSON, which chrome://tracing and ui.perfetto.dev open directly.
+TRACE = (os.getenv('ETL_TRACE') or '').lower() in ('1', 'true', 'yes')
+
+_events = None
+_thread_names = {}
+_lock = threading.Lock()
+# perf_counter for durations, anchored to wall time so traces of separate runs line up
+_wall_origin = time.time()
+_perf_origin = time.perf_counter()
+
+def enable():
+    """Start collecting spans in this process"""
+    global _events
+    with _lock:
+        if _events is None:
+            _events = []
+
+def enabled():
+    return _events is not None
+
+def _record(name, cat, started, seconds, attrs):
+    thread = threading.current_thread()
+    event = {
+        'name': name,
+        'cat': cat,
+        'ph': 'X',
+        'ts': round((_wall_origin + started - _perf_origin) * 1e6, 1),
+        'dur': round(seconds * 1e6, 1),
+        'pid': os.getpid(),
+        'tid': thread.ident,
+        'args': attrs,
+    }
+    with _lock:
+        if _events is not None:
+            _events.append(event)
+            _thread_names[thread.ident] = thread.name
+
+@contextmanager
+def span(name, cat='etl', **attrs):
+    """Time a block as a span; the yielded dict takes attributes set inside it (rows, bytes, ...)"""
+    if _events is None:
+        yield attrs
+        return
+    started = time.perf_counter()
+    try:
+        yield attrs
+    except BaseException as e:
+        attrs['error'] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _record(name, cat, started, time.perf_counter() - started, attrs)
+
+def complete(name, seconds, cat='etl', **attrs):
+    """Record a span of `seconds` that has just ended"""
+    if _events is not None:
+        _record(name, cat, time.perf_counter() - seconds, seconds, attrs)
+
+def traced_sleep(seconds, name='retry_wait', **attrs):
+    """time.sleep that shows up on the timeline as a retry stall"""
+    with span(name, cat='retry', seconds=seconds, **attrs):
+        time.sleep(seconds)
+
+def write_trace(path):
+    """Write the spans collected so far to path and start a fresh trace; returns the number of spans"""
+    global _events
+    with _lock:
+        events = _events or []
+        names = dict(_thread_names)
+        if _events is not None:
+            _events = []
+    metadata = [
+        {'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': tid, 'args': {'name': thread_name}}
+        for tid, thread_name in names.items()
+    ]
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'traceEvents': metadata + events, 'displayTimeUnit': 'ms'}, f, default=str)
+    return len(events)
@@ -0,0 +1,168 @@
+import sshtunnel
+import logging
+import threading
+import os
+from tracing import span, traced_sleep
+
+logger = logging.getLogger(__name__)
+
+# Transport settings selectable with SSH_TUNNEL_PROFILE. The rows crossing the tunnel
+# are mostly wide text and compress well; AES-GCM/CTR are the cheapest ciphers on
+# CPUs with AES-NI. Measure with benchmarks/tunnel_profiles.py before switching.
+FAST_CIPHERS = ('aes128-gcm@openssh.com', 'aes128-ctr', 'aes256-gcm@openssh.com', 'aes256-ctr')
+TUNNEL_PROFILES = {
+    'default': {'compression': False, 'ciphers': None},
+    'compressed': {'compression': True, 'ciphers': None},
+    'fast-cipher': {'compression': False, 'ciphers': FAST_CIPHERS},
+    'compressed-fast-cipher': {'compression': True, 'ciphers': FAST_CIPHERS},
+}
+
+class ProfiledForwarder(sshtunnel.SSHTunnelForwarder):
+    """SSHTunnelForwarder that restricts the transport to a preferred cipher list"""
+
+    def __init__(self, *args, ciphers=None, **kwargs):
+        self.preferred_ciphers = ciphers
+        super().__init__(*args, **kwargs)
+
+    def _get_transport(self):
+        transport = super()._get_transport()
+        if self.preferred_ciphers:
+            security_options = transport.get_security_options()
+            supported = [c for c in self.preferred_ciphers if c in security_options.ciphers]
+            if supported:
+                security_options.ciphers = supported
+            else:
+                logger.warning(f"None of {self.preferred_ciphers} is supported by paramiko; using defaults")
+        return transport
+
+class TunnelSupervisor:
+    """SSH tunnel to SQL Server that keeps itself alive and re-establishes itself when it drops.
+
+    Exposes local_bind_port and stop() like SSHTunnelForwarder, so it can be passed
+    anywhere a tunnel is expected. Each re-establishment bumps `generation`; readers
+    that fail mid-query call recover() to wait for the new tunnel and then resume
+    from their last checkpointed key.
+    """
+
+    def __init__(self, ssh_config, keepalive=15.0, probe_interval=20.0, max_recoveries=5, profile=None):
+        self.ssh_config = ssh_config
+        self.profile = profile or os.getenv('SSH_TUNNEL_PROFILE') or 'default'
+        if self.profile not in TUNNEL_PROFILES:
+            raise ValueError(f"Unknown SSH tunnel profile '{self.profile}'; choose from {sorted(TUNNEL_PROFILES)}")
+        self.keepalive = keepalive
+        self.probe_interval = probe_interval
+        self.max_recoveries = max_recoveries
+        self.generation = 0
+        self._generation_seen = 0
+        self.forwarder = None
+        self.local_port = 0
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._probe_thread = None
+
+    def _new_forwarder(self):
+        profile = TUNNEL_PROFILES[self.profile]
+        return ProfiledForwarder(
+            self.ssh_config['host'],
+            ssh_username=self.ssh_config['username'],
+            ssh_password=self.ssh_config['password'],
+            ssh_private_key=self.ssh_config['private_key_path'],
+            remote_bind_address=(self.ssh_config['remote_host'], self.ssh_config['remote_port']),
+            # Re-bind the same local port so connection strings stay valid after a restart
+            local_bind_address=('127.0.0.1', self.local_port),
+            set_keepalive=self.keepalive,
+            compression=profile['compression'],
+            ciphers=profile['ciphers'],
+        )
+
+    def start(self):
+        """Open the tunnel and start the background health probe"""
+        try:
+            with span('create_ssh_tunnel', cat='tunnel', profile=self.profile):
+                self.forwarder = self._new_forwarder()
+                self.forwarder.start()
+            self.local_port = self.forwarder.local_bind_port
+            logger.info(
+                f"SSH tunnel established on local port {self.local_port} "
+                f"(profile '{self.profile}', keepalive {self.keepalive}s)"
+            )
+        except Exception as e:
+            logger.error(f"Failed to create SSH tunnel: {str(e)}")
+            raise
+        self._probe_thread = threading.Thread(target=self._probe_loop, name='tunnel-probe', daemon=True)
+        self._probe_thread.start()
+        return self
+
+    @property
+    def local_bind_port(self):
+        return self.local_port
+
+    def is_healthy(self):
+        """True when the SSH transport is up and the forwarded port accepts connections"""
+        forwarder = self.forwarder
+        if forwarder is None or not forwarder.is_active:
+            return False
+        forwarder.check_tunnels()
+        return all(forwarder.tunnel_is_up.values())
+
+    def _reestablish(self):
+        with self._lock:
+            if self.is_healthy():
+                return True
+            logger.warning("SSH tunnel is down; re-establishing")
+            try:
+                self.forwarder.stop(force=True)
+            except Exception as e:
+                logger.warning(f"Error while stopping dead tunnel: {str(e)}")
+            for attempt in range(1, self.max_recoveries + 1):
+                try:
+                    with span('reestablish_ssh_tunnel', cat='tunnel', attempt=attempt):
+                        self.forwarder = self._new_forwarder()
+                        self.forwarder.start()
+                    self.generation += 1
+                    logger.info(
+                        f"SSH tunnel re-established on local port {self.local_port} "
+                        f"(generation {self.generation}, attempt {attempt})"
+                    )
+                    return True
+                except Exception as e:
+                    logger.error(f"Tunnel re-establishment attempt {attempt} failed: {str(e)}")
+                    traced_sleep(min(2 ** attempt, 30), name='tunnel_backoff', attempt=attempt)
+            return False
+
+    def _probe_loop(self):
+        while not self._stopping.wait(self.probe_interval):
+            try:
+                if not self.is_healthy():
+                    self._reestablish()
+            except Exception as e:
+                logger.error(f"Tunnel health probe failed: {str(e)}")
+
+    def recover(self, error, attempt):
+        """Decide whether a failed reader should retry: re-establish the tunnel if needed and wait for it.
+
+        Returns True when the caller should reconnect to SQL Server and resume from its checkpoint.
+        """
+        if self._stopping.is_set() or attempt > self.max_recoveries:
+            return False
+        if self.generation != self._generation_seen:
+            # The probe already replaced the tunnel underneath the reader
+            self._generation_seen = self.generation
+            logger.warning(f"Reader failed across a tunnel re-establishment ({str(error)}); resuming")
+            return True
+        if self.is_healthy():
+            # The tunnel is fine, so the failure was not caused by it
+            logger.info(f"Tunnel healthy after reader error ({str(error)}); not retrying")
+            return False
+        logger.warning(f"Reader failed while the tunnel was down ({str(error)}); recovering")
+        recovered = self._reestablish()
+        self._generation_seen = self.generation
+        return recovered
+
+    def stop(self):
+        """Stop the health probe and close the tunnel"""
+        self._stopping.set()
+        if self._probe_thread is not None:
+            self._probe_thread.join(timeout=self.probe_interval)
+        if self.forwarder is not None:
+            self.forwarder.stop()